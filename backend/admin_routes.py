@@ -7,10 +7,11 @@ from pydantic import BaseModel
 from typing import List, Optional
 from datetime import datetime, timezone
 from bson import ObjectId
-from openpyxl import Workbook
-from io import BytesIO
+import xlsxwriter
+import tempfile
 from motor.motor_asyncio import AsyncIOMotorClient
 import logging
+import asyncio
 import uuid
 import os
 from dotenv import load_dotenv
@@ -24,6 +25,24 @@ logger = logging.getLogger(__name__)
 # Create admin router
 admin_router = APIRouter(prefix="/api/admin", tags=["Admin"])
 
+# Callbacks run after the exchange rate changes (server.py resets its rate caches here)
+rate_update_hooks: list = []
+
+# Callbacks run with a user_id after a users document changes (server.py drops
+# its cached sessions for that user here)
+user_update_hooks: list = []
+
+def user_changed(user_id: str):
+    """Tell server.py that a user document was written"""
+    for hook in user_update_hooks:
+        hook(user_id)
+
+# Support messages are created as "pending", move to "sent" once relayed by
+# WhatsApp and end as "closed". Only these statuses count as an open
+# conversation; any other or missing status is treated as closed.
+# server.py's WhatsApp webhook and its partial index use the same list.
+OPEN_SUPPORT_STATUSES = ["pending", "sent"]
+
 # MongoDB connection
 mongo_url = os.environ['MONGO_URL']
 client = AsyncIOMotorClient(mongo_url)
@@ -205,7 +224,7 @@ async def get_admin_dashboard(admin_user: dict = Depends(get_admin_user)):
     pending_recharges = await db.transactions.count_documents({"type": "recharge", "status": "pending_review"})
     completed_transactions = await db.transactions.count_documents({"status": "completed"})
     
-    open_support = await db.support_messages.count_documents({"status": {"$ne": "closed"}})
+    open_support = await db.support_messages.count_documents({"status": {"$in": OPEN_SUPPORT_STATUSES}})
     
     # Volume calculations
     pipeline = [
@@ -285,6 +304,7 @@ async def create_sub_admin(request: CreateSubAdminRequest, admin_user: dict = De
                 "updated_at": datetime.now(timezone.utc)
             }}
         )
+        user_changed(existing["user_id"])
         return {"message": f"Usuario {request.email} promovido a admin", "user_id": existing.get('user_id')}
     else:
         # Create new admin user
@@ -323,6 +343,7 @@ async def update_sub_admin(user_id: str, request: UpdateSubAdminRequest, admin_u
         update_data["name"] = request.name
     
     await db.users.update_one({"user_id": user_id}, {"$set": update_data})
+    user_changed(user_id)
     return {"message": "Admin actualizado"}
 
 @admin_router.delete("/sub-admins/{user_id}")
@@ -340,6 +361,7 @@ async def delete_sub_admin(user_id: str, admin_user: dict = Depends(get_super_ad
         {"user_id": user_id},
         {"$set": {"role": "user", "permissions": []}}
     )
+    user_changed(user_id)
     return {"message": "Rol de admin removido"}
 
 # =======================
@@ -416,6 +438,7 @@ async def update_user_balance(user_id: str, request: AdjustBalanceRequest, admin
     
     if result.modified_count == 0:
         raise HTTPException(status_code=404, detail="Usuario no encontrado")
+    user_changed(user_id)
     
     # Log the adjustment
     adjustment = {
@@ -477,6 +500,7 @@ async def decide_verification(decision: VerificationDecision, admin_user: dict =
     
     if result.modified_count == 0:
         raise HTTPException(status_code=404, detail="User not found")
+    user_changed(decision.user_id)
     
     # Notify user
     if decision.approved:
@@ -583,6 +607,7 @@ async def process_withdrawal_admin(request: ProcessWithdrawalAdminRequest, admin
             {"user_id": tx['user_id']},
             {"$inc": {"balance_ris": tx['amount_input']}}
         )
+        user_changed(tx['user_id'])
         
         await db.transactions.update_one(
             {"transaction_id": request.transaction_id},
@@ -672,6 +697,7 @@ async def approve_recharge(request: ApproveRechargeRequest, admin_user: dict = D
             {"user_id": user_id},
             {"$inc": {"balance_ris": amount_ris}}
         )
+        user_changed(user_id)
         
         # Update transaction status
         await db.transactions.update_one(
@@ -797,31 +823,45 @@ async def get_transaction_detail(transaction_id: str, admin_user: dict = Depends
     
     return tx
 
-@admin_router.get("/transactions/export")
-async def export_transactions(admin_user: dict = Depends(get_admin_user)):
-    """Export all transactions to Excel"""
-    if not has_permission(admin_user, "transactions.export"):
-        raise HTTPException(status_code=403, detail="Permission denied")
-    
-    transactions = await db.transactions.find({}, {"_id": 0, "proof_image": 0}).to_list(10000)
-    
-    # Create workbook
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "Transactions"
+EXPORT_SPOOL_MAX_BYTES = 8 << 20
+EXPORT_CHUNK_BYTES = 64 * 1024
+
+def _build_transactions_workbook(rows: list) -> tempfile.SpooledTemporaryFile:
+    """Write the export rows to an xlsx file (blocking file I/O, run it off the event loop)"""
+    # Create workbook (constant_memory flushes each row to a temp file);
+    # the finished file spills to disk past 8 MB
+    output = tempfile.SpooledTemporaryFile(max_size=EXPORT_SPOOL_MAX_BYTES)
+    wb = xlsxwriter.Workbook(output, {'constant_memory': True})
+    ws = wb.add_worksheet("Transactions")
     
     # Headers
     headers = ["Transaction ID", "User ID", "Type", "Status", "Amount Input", "Amount Output", 
                "Created At", "Completed At", "Beneficiary"]
-    ws.append(headers)
+    ws.write_row(0, 0, headers)
+    
+    for row, values in enumerate(rows, start=1):
+        ws.write_row(row, 0, values)
     
-    # Data
-    for t in transactions:
+    wb.close()
+    output.seek(0)
+    return output
+
+async def transactions_export_response() -> StreamingResponse:
+    """Stream all transactions as an Excel file (shared with server.py's /transactions/export)"""
+    # Data, read in batches with only the exported columns
+    cursor = db.transactions.find(
+        {},
+        {"_id": 0, "transaction_id": 1, "user_id": 1, "type": 1, "status": 1, "amount_input": 1,
+         "amount_output": 1, "created_at": 1, "completed_at": 1, "beneficiary_data.full_name": 1}
+    ).limit(10000).batch_size(1000)
+    
+    rows = []
+    async for t in cursor:
         beneficiary_name = ""
         if t.get("beneficiary_data"):
             beneficiary_name = t["beneficiary_data"].get("full_name", "")
         
-        ws.append([
+        rows.append([
             t.get("transaction_id", ""),
             t.get("user_id", ""),
             t.get("type", ""),
@@ -833,17 +873,31 @@ async def export_transactions(admin_user: dict = Depends(get_admin_user)):
             beneficiary_name
         ])
     
-    # Save to bytes
-    output = BytesIO()
-    wb.save(output)
-    output.seek(0)
+    output = await asyncio.to_thread(_build_transactions_workbook, rows)
+    
+    def iter_export():
+        with output:
+            while chunk := output.read(EXPORT_CHUNK_BYTES):
+                yield chunk
     
     return StreamingResponse(
-        output,
+        iter_export(),
         media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-        headers={"Content-Disposition": "attachment; filename=transactions.xlsx"}
+        headers={
+            "Content-Disposition": "attachment; filename=transactions.xlsx",
+            # xlsx is already a zip archive, keep GZipMiddleware from recompressing it
+            "Content-Encoding": "identity",
+        }
     )
 
+@admin_router.get("/transactions/export")
+async def export_transactions(admin_user: dict = Depends(get_admin_user)):
+    """Export all transactions to Excel"""
+    if not has_permission(admin_user, "transactions.export"):
+        raise HTTPException(status_code=403, detail="Permission denied")
+    
+    return await transactions_export_response()
+
 # =======================
 # PAYMENT RECORDS
 # =======================
@@ -1061,6 +1115,8 @@ async def update_exchange_rate(request: UpdateRateRequest, admin_user: dict = De
         "updated_by": admin_user.get('user_id')
     }
     await db.exchange_rates.insert_one(new_rate)
+    for hook in rate_update_hooks:
+        hook()
     
     logger.info(f"Exchange rate updated to {request.ris_to_ves} by {admin_user.get('email')}")
     
@@ -1,11 +1,18 @@
-from fastapi import FastAPI, APIRouter, Depends, HTTPException, Request, Header
+from fastapi import FastAPI, APIRouter, Depends, HTTPException, Request, Header, Query
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from fastapi.responses import StreamingResponse, FileResponse
+from fastapi.responses import FileResponse, PlainTextResponse, Response, ORJSONResponse
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
-from motor.motor_asyncio import AsyncIOMotorClient
+from starlette.middleware.gzip import GZipMiddleware
 import os
+# Motor runs every driver call on a thread pool sized at import time (cpu_count * 5
+# by default); a few threads are enough for short queries and contend less. Env overrides it.
+os.environ.setdefault("MOTOR_MAX_WORKERS", "4")
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ReturnDocument
+from bson import ObjectId
 import logging
+import asyncio
 from pathlib import Path
 from pydantic import BaseModel, Field
 from typing import List, Optional
@@ -13,24 +20,37 @@ import uuid
 from datetime import datetime, timezone, timedelta
 import httpx
 import json
+import orjson
 import base64
-from openpyxl import Workbook
-from io import BytesIO
+import hashlib
 import bcrypt
 import secrets
 import re
+import time
 import smtplib
+import traceback
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from twilio.rest import Client as TwilioClient
 from whatsapp_service import whatsapp_service
 from mercadopago_service import mercadopago_service
-from admin_routes import admin_router
+from admin_routes import (
+    admin_router, rate_update_hooks, user_update_hooks, transactions_export_response, OPEN_SUPPORT_STATUSES
+)
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
 # MongoDB connection
+# Motor stays until pymongo is bumped past 4.9 for AsyncMongoClient; that API makes
+# aggregate() a coroutine, so every .aggregate(...).to_list() call site changes with it
 mongo_url = os.environ['MONGO_URL']
 client = AsyncIOMotorClient(mongo_url)
 db = client[os.environ['DB_NAME']]
@@ -47,11 +67,23 @@ twilio_client = None
 if TWILIO_ACCOUNT_SID and TWILIO_AUTH_TOKEN:
     twilio_client = TwilioClient(TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN)
 
+# SMTP Configuration (password reset emails)
+SMTP_HOST = os.getenv('SMTP_HOST', '')
+SMTP_PORT = int(os.getenv('SMTP_PORT', '587'))
+SMTP_USER = os.getenv('SMTP_USER', '')
+SMTP_PASS = os.getenv('SMTP_PASS', '')
+
+# Upper bound for a single push delivery inside latency-sensitive webhooks
+PUSH_TIMEOUT_SECONDS = 3.0
+
+# Shared outbound HTTP client (connection pool), created on startup
+http_client: Optional[httpx.AsyncClient] = None
+
 # Stripe configuration (disabled - using Mercado Pago PIX)
 # stripe.api_key = os.getenv('STRIPE_SECRET_KEY', 'sk_test_placeholder')
 
 # Create the main app without a prefix
-app = FastAPI()
+app = FastAPI(default_response_class=ORJSONResponse)
 
 # Create a router with the /api prefix
 api_router = APIRouter(prefix="/api")
@@ -147,42 +179,41 @@ async def send_push_notification(push_token: str, title: str, body: str, data: d
         
         logger.info(f"📤 Enviando a Expo Push API...")
         
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                expo_push_url,
-                json=message,
-                headers={
-                    "Accept": "application/json",
-                    "Accept-encoding": "gzip, deflate",
-                    "Content-Type": "application/json",
-                }
-            )
-            
-            result = response.json()
-            logger.info(f"📥 Respuesta de Expo Push API: status={response.status_code}, result={result}")
+        response = await http_client.post(
+            expo_push_url,
+            json=message,
+            headers={
+                "Accept": "application/json",
+                "Accept-encoding": "gzip, deflate",
+                "Content-Type": "application/json",
+            }
+        )
+        
+        result = response.json()
+        logger.info(f"📥 Respuesta de Expo Push API: status={response.status_code}, result={result}")
+        
+        if response.status_code == 200:
+            # Verificar si hay errores en la respuesta
+            if isinstance(result, dict) and result.get("data"):
+                ticket = result["data"]
+                if isinstance(ticket, list) and len(ticket) > 0:
+                    ticket = ticket[0]
+                if ticket.get("status") == "error":
+                    error_type = ticket.get("details", {}).get("error", "")
+                    if error_type == "DeviceNotRegistered":
+                        logger.error(f"❌ Token inválido o dispositivo no registrado")
+                    else:
+                        logger.error(f"❌ Error en ticket: {ticket.get('message')} - {ticket.get('details')}")
+                    return False
+                elif ticket.get("status") == "ok":
+                    logger.info(f"✅ Push notification enviada exitosamente. Ticket ID: {ticket.get('id')}")
+                    return True
             
-            if response.status_code == 200:
-                # Verificar si hay errores en la respuesta
-                if isinstance(result, dict) and result.get("data"):
-                    ticket = result["data"]
-                    if isinstance(ticket, list) and len(ticket) > 0:
-                        ticket = ticket[0]
-                    if ticket.get("status") == "error":
-                        error_type = ticket.get("details", {}).get("error", "")
-                        if error_type == "DeviceNotRegistered":
-                            logger.error(f"❌ Token inválido o dispositivo no registrado")
-                        else:
-                            logger.error(f"❌ Error en ticket: {ticket.get('message')} - {ticket.get('details')}")
-                        return False
-                    elif ticket.get("status") == "ok":
-                        logger.info(f"✅ Push notification enviada exitosamente. Ticket ID: {ticket.get('id')}")
-                        return True
-                
-                logger.info(f"✅ Push notification enviada (status 200)")
-                return True
-            else:
-                logger.error(f"❌ Push notification failed: {result}")
-                return False
+            logger.info(f"✅ Push notification enviada (status 200)")
+            return True
+        else:
+            logger.error(f"❌ Push notification failed: {result}")
+            return False
                 
     except Exception as e:
         logger.error(f"❌ Error sending push notification: {e}")
@@ -199,7 +230,7 @@ async def send_push_to_admins(title: str, body: str, data: dict = None) -> int:
     """Send push notification to all admins with FCM tokens"""
     sent_count = 0
     admins = await db.users.find(
-        {"role": {"$in": ["admin", "super_admin"]}, "fcm_token": {"$exists": True, "$ne": None}},
+        {"role": ADMIN_ROLE_FILTER, "fcm_token": {"$exists": True, "$ne": None}},
         {"fcm_token": 1}
     ).to_list(100)
     
@@ -215,6 +246,14 @@ async def send_push_to_admins(title: str, body: str, data: dict = None) -> int:
 # MODELS
 # =======================
 
+def utcnow() -> datetime:
+    """Timezone-aware current time, used as the model timestamp default"""
+    return datetime.now(timezone.utc)
+
+def new_uuid() -> str:
+    """Random UUID4 string built straight from os.urandom (no uuid4() indirection)"""
+    return str(uuid.UUID(bytes=os.urandom(16), version=4))
+
 class User(BaseModel):
     user_id: str
     email: str
@@ -257,7 +296,7 @@ class User(BaseModel):
     # Admin status
     is_active: bool = True
     last_login: Optional[datetime] = None
-    created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    created_at: datetime = Field(default_factory=utcnow)
 
 # Available permissions for sub-admins
 ADMIN_PERMISSIONS = {
@@ -282,17 +321,27 @@ ADMIN_PERMISSIONS = {
     "dashboard.view": "Ver dashboard",
 }
 
+# Shared query fragments (read-only, never mutate)
+ADMIN_ROLE_FILTER = {"$in": ["admin", "super_admin"]}
+USER_ROLE_FILTER = {"$in": ["user", None]}
+NO_KYC_IMAGES_PROJECTION = {"id_document_image": 0, "cpf_image": 0, "selfie_image": 0}
+# Transaction lists never need the proof blob (served by /transaction/{id}/proof);
+# _id is kept for page cursors and dropped by model_construct
+TRANSACTION_LIST_PROJECTION = {"proof_image": 0}
+# Page size of user-facing lists (clients page with the X-Next-Cursor header)
+LIST_PAGE_MAX = 1000
+
 class UserSession(BaseModel):
     user_id: str
     session_token: str
     expires_at: datetime
-    created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    created_at: datetime = Field(default_factory=utcnow)
 
 class ExchangeRate(BaseModel):
     ris_to_ves: float = 92.0        # 1 RIS = 92 VES (para enviar a Venezuela)
     ves_to_ris: float = 102.0       # 102 VES = 1 RIS (para recargar con Bolívares)
     ris_to_brl: float = 1.0         # 1 RIS = 1 BRL (para enviar a Brasil)
-    updated_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    updated_at: datetime = Field(default_factory=utcnow)
     updated_by: Optional[str] = None
 
 # Bank info for VES payments
@@ -306,7 +355,7 @@ class VESPaymentInfo(BaseModel):
     id_document: str = "J-12345678-9"
 
 class Beneficiary(BaseModel):
-    beneficiary_id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    beneficiary_id: str = Field(default_factory=new_uuid)
     user_id: str
     full_name: str
     account_number: str
@@ -314,10 +363,10 @@ class Beneficiary(BaseModel):
     phone_number: str
     bank: str
     bank_code: Optional[str] = None  # Venezuelan bank code (e.g., 0102)
-    created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    created_at: datetime = Field(default_factory=utcnow)
 
 class Transaction(BaseModel):
-    transaction_id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    transaction_id: str = Field(default_factory=new_uuid)
     user_id: str
     type: str  # "recharge" or "withdrawal"
     status: str  # "pending", "completed", "rejected"
@@ -329,7 +378,7 @@ class Transaction(BaseModel):
     beneficiary_data: Optional[dict] = None
     proof_image: Optional[str] = None  # base64
     processed_by: Optional[str] = None  # admin user_id
-    created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    created_at: datetime = Field(default_factory=utcnow)
     completed_at: Optional[datetime] = None
 
 class SessionDataResponse(BaseModel):
@@ -478,21 +527,16 @@ Equipo RIS
         logger.info(f"Password reset email for {email}: Temp password = {temp_password}")
         
         # Try to send via SMTP if configured
-        smtp_host = os.getenv('SMTP_HOST', '')
-        smtp_port = int(os.getenv('SMTP_PORT', '587'))
-        smtp_user = os.getenv('SMTP_USER', '')
-        smtp_pass = os.getenv('SMTP_PASS', '')
-        
-        if smtp_host and smtp_user:
+        if SMTP_HOST and SMTP_USER:
             msg = MIMEMultipart()
-            msg['From'] = smtp_user
+            msg['From'] = SMTP_USER
             msg['To'] = email
             msg['Subject'] = subject
             msg.attach(MIMEText(body, 'plain'))
             
-            with smtplib.SMTP(smtp_host, smtp_port) as server:
+            with smtplib.SMTP(SMTP_HOST, SMTP_PORT) as server:
                 server.starttls()
-                server.login(smtp_user, smtp_pass)
+                server.login(SMTP_USER, SMTP_PASS)
                 server.send_message(msg)
             logger.info(f"Password reset email sent to {email}")
         else:
@@ -517,8 +561,42 @@ Equipo RIS
 # AUTH DEPENDENCIES
 # =======================
 
+# Resolved sessions: token -> (cached_at, user document, expires_at)
+SESSION_CACHE_TTL_SECONDS = 15
+SESSION_CACHE_MAX_ENTRIES = 10000
+_session_cache: dict[str, tuple[float, dict, datetime]] = {}
+# user_id -> cached tokens of that user, so evicting a user is not a full scan
+_session_tokens_by_user: dict[str, set[str]] = {}
+
+def cache_session(session_token: str, user_doc: dict, expires_at: datetime):
+    """Remember a resolved session for SESSION_CACHE_TTL_SECONDS"""
+    if len(_session_cache) >= SESSION_CACHE_MAX_ENTRIES:
+        _session_cache.clear()
+        _session_tokens_by_user.clear()
+    _session_cache[session_token] = (time.monotonic(), user_doc, expires_at)
+    _session_tokens_by_user.setdefault(user_doc.get("user_id"), set()).add(session_token)
+
+def forget_cached_session(session_token: str):
+    """Drop one cached session (logout, expiry)"""
+    entry = _session_cache.pop(session_token, None)
+    if entry:
+        tokens = _session_tokens_by_user.get(entry[1].get("user_id"))
+        if tokens is not None:
+            tokens.discard(session_token)
+            if not tokens:
+                _session_tokens_by_user.pop(entry[1].get("user_id"), None)
+
+def forget_cached_sessions(user_id: str):
+    """Drop cached sessions of a user so the next request re-reads the profile"""
+    for token in _session_tokens_by_user.pop(user_id, ()):
+        _session_cache.pop(token, None)
+
+# The admin panel's user writes (roles, permissions, balances, KYC) go through here too
+user_update_hooks.append(forget_cached_sessions)
+
 async def get_current_user(request: Request, authorization: Optional[str] = Header(None)) -> Optional[User]:
     """Get current user from session token (cookie or header)"""
+    now = datetime.now(timezone.utc)
     session_token = None
     
     # Check cookie first
@@ -532,37 +610,52 @@ async def get_current_user(request: Request, authorization: Optional[str] = Head
     if not session_token:
         raise HTTPException(status_code=401, detail="Not authenticated")
     
-    # Find session
-    session = await db.user_sessions.find_one(
-        {"session_token": session_token},
-        {"_id": 0}
-    )
+    cached = _session_cache.get(session_token)
+    if cached:
+        cached_at, user_doc, expires_at = cached
+        if time.monotonic() - cached_at < SESSION_CACHE_TTL_SECONDS and expires_at >= now:
+            # Fresh model per request, dependencies mutate role/permissions
+            return User(**user_doc)
+        forget_cached_session(session_token)
+    
+    # Find a live session and its user in one round-trip (expired sessions
+    # are filtered here and purged by the TTL index)
+    docs = await db.user_sessions.aggregate([
+        {"$match": {"session_token": session_token, "expires_at": {"$gt": now}}},
+        {"$limit": 1},
+        {"$lookup": {
+            "from": "users",
+            "let": {"uid": "$user_id"},
+            "pipeline": [
+                {"$match": {"$expr": {"$eq": ["$user_id", "$$uid"]}}},
+                {"$limit": 1},
+                # KYC images are cold data, never shipped on auth
+                {"$project": {"_id": 0, **NO_KYC_IMAGES_PROJECTION}}
+            ],
+            "as": "user"
+        }},
+        {"$project": {"_id": 0, "expires_at": 1, "user": {"$arrayElemAt": ["$user", 0]}}}
+    ]).to_list(1)
     
-    if not session:
+    if not docs:
         raise HTTPException(status_code=401, detail="Invalid session")
+    session = docs[0]
     
-    # Check expiration
-    expires_at = session["expires_at"]
-    if expires_at.tzinfo is None:
-        expires_at = expires_at.replace(tzinfo=timezone.utc)
-    
-    if expires_at < datetime.now(timezone.utc):
-        raise HTTPException(status_code=401, detail="Session expired")
-    
-    # Get user
-    user_doc = await db.users.find_one(
-        {"user_id": session["user_id"]},
-        {"_id": 0}
-    )
-    
+    user_doc = session.get("user")
     if not user_doc:
         raise HTTPException(status_code=404, detail="User not found")
     
+    # Mongo returns naive UTC datetimes
+    expires_at = session["expires_at"].replace(tzinfo=timezone.utc)
+    cache_session(session_token, user_doc, expires_at)
+    
     return User(**user_doc)
 
 async def get_admin_user(current_user: User = Depends(get_current_user)) -> User:
     """Check if user is admin or super_admin"""
-    user_data = await db.users.find_one({"user_id": current_user.user_id})
+    user_data = await db.users.find_one(
+        {"user_id": current_user.user_id}, {"_id": 0, "role": 1, "permissions": 1}
+    )
     role = user_data.get('role', 'user') if user_data else 'user'
     
     if role not in ['admin', 'super_admin']:
@@ -575,7 +668,7 @@ async def get_admin_user(current_user: User = Depends(get_current_user)) -> User
 
 async def get_super_admin(current_user: User = Depends(get_current_user)) -> User:
     """Check if user is super_admin"""
-    user_data = await db.users.find_one({"user_id": current_user.user_id})
+    user_data = await db.users.find_one({"user_id": current_user.user_id}, {"_id": 0, "role": 1})
     role = user_data.get('role', 'user') if user_data else 'user'
     
     if role != 'super_admin':
@@ -635,52 +728,49 @@ async def download_build():
 @api_router.post("/auth/session")
 async def create_session(request: Request, x_session_id: str = Header(..., alias="X-Session-ID")):
     """Exchange session_id for user data and session_token"""
+    now = datetime.now(timezone.utc)
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                "https://demobackend.emergentagent.com/auth/v1/env/oauth/session-data",
-                headers={"X-Session-ID": x_session_id}
-            )
-            response.raise_for_status()
-            user_data = response.json()
-        
-        # Create or update user
-        user_id = f"user_{uuid.uuid4().hex[:12]}"
-        existing_user = await db.users.find_one({"email": user_data["email"]}, {"_id": 0})
+        response = await http_client.get(
+            "https://demobackend.emergentagent.com/auth/v1/env/oauth/session-data",
+            headers={"X-Session-ID": x_session_id}
+        )
+        response.raise_for_status()
+        user_data = response.json()
         
-        if existing_user:
-            user_id = existing_user["user_id"]
-            # Invalidate all previous sessions (single session policy)
-            await db.user_sessions.delete_many({"user_id": user_id})
-        else:
-            # Create new user
-            new_user = User(
-                user_id=user_id,
-                email=user_data["email"],
-                name=user_data["name"],
-                picture=user_data.get("picture"),
-                balance_ris=0.0
-            )
-            await db.users.insert_one(new_user.dict())
+        # Create the user on first login and stamp last_login in the same round-trip
+        new_user = User(
+            user_id=f"user_{uuid.uuid4().hex[:12]}",
+            email=user_data["email"],
+            name=user_data["name"],
+            picture=user_data.get("picture"),
+            balance_ris=0.0
+        ).dict(exclude={"last_login"})
+        user_doc = await db.users.find_one_and_update(
+            {"email": user_data["email"]},
+            {"$setOnInsert": new_user, "$set": {"last_login": now}},
+            projection={"_id": 0, "user_id": 1},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+        user_id = user_doc["user_id"]
         
         # Create session
         session_token = user_data["session_token"]
         session = UserSession(
             user_id=user_id,
             session_token=session_token,
-            expires_at=datetime.now(timezone.utc) + timedelta(days=7)
+            expires_at=now + timedelta(days=7)
         )
-        await db.user_sessions.insert_one(session.dict())
-        
-        # Update last login
-        await db.users.update_one(
-            {"user_id": user_id},
-            {"$set": {"last_login": datetime.now(timezone.utc)}}
+        # Store the session and invalidate all previous ones (single session policy)
+        await asyncio.gather(
+            db.user_sessions.insert_one(session.dict()),
+            db.user_sessions.delete_many({"user_id": user_id, "session_token": {"$ne": session_token}})
         )
+        forget_cached_sessions(user_id)
         
         return SessionDataResponse(**user_data)
     except Exception as e:
-        logging.error(f"Session creation error: {e}")
+        logger.error("Session creation error: %s", e)
         raise HTTPException(status_code=400, detail=str(e))
 
 @api_router.get("/auth/me")
@@ -696,15 +786,18 @@ async def get_me(current_user: User = Depends(get_current_user)):
 async def logout(request: Request, current_user: User = Depends(get_current_user)):
     session_token = request.cookies.get('session_token')
     if session_token:
+        forget_cached_session(session_token)
         await db.user_sessions.delete_one({"session_token": session_token})
     return {"message": "Logged out successfully"}
 
+class RegisterFcmTokenRequest(BaseModel):
+    fcm_token: Optional[str] = None
+
 @api_router.post("/auth/register-fcm-token")
-async def register_fcm_token(request: Request, current_user: User = Depends(get_current_user)):
+async def register_fcm_token(request: RegisterFcmTokenRequest, current_user: User = Depends(get_current_user)):
     """Register FCM token for push notifications"""
     try:
-        data = await request.json()
-        fcm_token = data.get('fcm_token')
+        fcm_token = request.fcm_token
         
         logger.info(f"📱 Registrando FCM token para usuario {current_user.user_id}")
         logger.info(f"   Token recibido: {fcm_token[:30] if fcm_token else 'None'}...")
@@ -717,6 +810,7 @@ async def register_fcm_token(request: Request, current_user: User = Depends(get_
             {"user_id": current_user.user_id},
             {"$set": {"fcm_token": fcm_token}}
         )
+        forget_cached_sessions(current_user.user_id)
         
         logger.info(f"✅ FCM token registrado para usuario {current_user.user_id}")
         logger.info(f"   Modified count: {result.modified_count}")
@@ -778,6 +872,7 @@ async def clear_push_token(current_user: User = Depends(get_current_user)):
         {"user_id": current_user.user_id},
         {"$unset": {"fcm_token": ""}}
     )
+    forget_cached_sessions(current_user.user_id)
     logger.info(f"🔔 Token push eliminado para usuario {current_user.user_id}")
     return {"status": "success", "message": "Token eliminado. Abre la app móvil para registrar uno nuevo."}
 
@@ -843,16 +938,19 @@ async def test_push_notification(current_user: User = Depends(get_current_user))
             "action_required": "Cierra y vuelve a abrir la app RIS en tu dispositivo móvil."
         }
 
+class SendPushToUserRequest(BaseModel):
+    title: str = "Notificación RIS"
+    body: str = ""
+
 @api_router.post("/push/send-to-user/{user_id}")
 async def send_push_to_specific_user(
     user_id: str,
-    request: Request,
+    request: SendPushToUserRequest,
     admin_user: User = Depends(get_admin_user)
 ):
     """Admin: Send push notification to a specific user"""
-    data = await request.json()
-    title = data.get("title", "Notificación RIS")
-    body = data.get("body", "")
+    title = request.title
+    body = request.body
     
     if not body:
         raise HTTPException(status_code=400, detail="Message body is required")
@@ -943,7 +1041,7 @@ async def delete_user(user_id: str, admin_user: User = Depends(get_super_admin))
         raise HTTPException(status_code=400, detail="No puedes eliminarte a ti mismo")
     
     # Check if user exists
-    user = await db.users.find_one({"user_id": user_id})
+    user = await db.users.find_one({"user_id": user_id}, {"_id": 0, "role": 1, "name": 1, "email": 1})
     if not user:
         raise HTTPException(status_code=404, detail="Usuario no encontrado")
     
@@ -962,6 +1060,7 @@ async def delete_user(user_id: str, admin_user: User = Depends(get_super_admin))
             }
         }
     )
+    forget_cached_sessions(user_id)
     
     return {"message": f"Usuario {user.get('name', user.get('email'))} eliminado correctamente"}
 
@@ -1001,6 +1100,7 @@ async def restore_user(user_id: str, admin_user: User = Depends(get_super_admin)
             "$unset": {"deleted": "", "deleted_at": "", "deleted_by": ""},
         }
     )
+    forget_cached_sessions(user_id)
     
     return {"message": f"Usuario {user.get('name', user.get('email'))} restaurado correctamente"}
 
@@ -1022,7 +1122,7 @@ async def set_password(request: SetPasswordRequest, current_user: User = Depends
         raise HTTPException(status_code=400, detail=message)
     
     # Check if user already has password
-    user = await db.users.find_one({"user_id": current_user.user_id})
+    user = await db.users.find_one({"user_id": current_user.user_id}, {"_id": 0, "password_set": 1})
     if user.get('password_set'):
         raise HTTPException(status_code=400, detail="Ya tienes una contraseña configurada. Usa 'cambiar contraseña' si deseas modificarla.")
     
@@ -1036,6 +1136,7 @@ async def set_password(request: SetPasswordRequest, current_user: User = Depends
             "password_changed_at": datetime.now(timezone.utc)
         }}
     )
+    forget_cached_sessions(current_user.user_id)
     
     logger.info(f"Password set for user {current_user.user_id}")
     return {"message": "Contraseña configurada exitosamente"}
@@ -1043,6 +1144,7 @@ async def set_password(request: SetPasswordRequest, current_user: User = Depends
 @api_router.post("/auth/register")
 async def register_user(request: RegisterUserRequest):
     """Step 1: Register user and send verification code to email"""
+    now = datetime.now(timezone.utc)
     
     # Validate email format
     email_regex = r'^[^\s@]+@[^\s@]+\.[^\s@]+$'
@@ -1086,8 +1188,8 @@ async def register_user(request: RegisterUserRequest):
         "phone": request.phone.strip() if request.phone else None,
         "password_hash": hash_password(request.password),
         "verification_code": verification_code,
-        "code_expires_at": datetime.now(timezone.utc) + timedelta(minutes=15),
-        "created_at": datetime.now(timezone.utc),
+        "code_expires_at": now + timedelta(minutes=15),
+        "created_at": now,
         "attempts": 0
     }
     
@@ -1125,6 +1227,7 @@ async def register_user(request: RegisterUserRequest):
 @api_router.post("/auth/verify-email")
 async def verify_email_code(request: VerifyEmailCodeRequest):
     """Step 2: Verify email code and complete registration"""
+    now = datetime.now(timezone.utc)
     
     email_lower = request.email.lower().strip()
     
@@ -1135,7 +1238,7 @@ async def verify_email_code(request: VerifyEmailCodeRequest):
         raise HTTPException(status_code=400, detail="No hay verificación pendiente para este email. Regístrate nuevamente.")
     
     # Check if code expired
-    if datetime.now(timezone.utc) > pending["code_expires_at"].replace(tzinfo=timezone.utc):
+    if now > pending["code_expires_at"].replace(tzinfo=timezone.utc):
         await db.pending_verifications.delete_one({"email": email_lower})
         raise HTTPException(status_code=400, detail="El código ha expirado. Solicita uno nuevo.")
     
@@ -1166,15 +1269,15 @@ async def verify_email_code(request: VerifyEmailCodeRequest):
         "balance_ris": 0.0,
         "password_hash": pending["password_hash"],
         "password_set": True,
-        "password_changed_at": datetime.now(timezone.utc),
+        "password_changed_at": now,
         "role": "user",
         "permissions": [],
         "verification_status": "unverified",  # KYC status - starts as unverified until docs submitted
         "email_verified": True,  # Email is now verified
-        "email_verified_at": datetime.now(timezone.utc),
+        "email_verified_at": now,
         "accepted_policies": False,
         "is_active": True,
-        "created_at": datetime.now(timezone.utc),
+        "created_at": now,
         "registration_method": "email"
     }
     
@@ -1188,8 +1291,8 @@ async def verify_email_code(request: VerifyEmailCodeRequest):
     session_data = {
         "user_id": user_id,
         "session_token": session_token,
-        "created_at": datetime.now(timezone.utc),
-        "expires_at": datetime.now(timezone.utc) + timedelta(days=7),
+        "created_at": now,
+        "expires_at": now + timedelta(days=7),
         "login_method": "registration"
     }
     await db.user_sessions.insert_one(session_data)
@@ -1291,6 +1394,7 @@ async def resend_verification_code(request: ResendVerificationCodeRequest):
 @api_router.post("/auth/login-password")
 async def login_with_password(request: LoginWithPasswordRequest):
     """Login with email and password"""
+    now = datetime.now(timezone.utc)
     
     # Find user by email
     user = await db.users.find_one({"email": request.email.lower()})
@@ -1302,8 +1406,8 @@ async def login_with_password(request: LoginWithPasswordRequest):
         lock_time = user['locked_until']
         if lock_time.tzinfo is None:
             lock_time = lock_time.replace(tzinfo=timezone.utc)
-        if lock_time > datetime.now(timezone.utc):
-            remaining = int((lock_time - datetime.now(timezone.utc)).total_seconds() / 60)
+        if lock_time > now:
+            remaining = int((lock_time - now).total_seconds() / 60)
             raise HTTPException(status_code=423, detail=f"Cuenta bloqueada. Intenta en {remaining} minutos.")
     
     # Check if user has password set
@@ -1318,7 +1422,7 @@ async def login_with_password(request: LoginWithPasswordRequest):
         
         # Lock account after 5 failed attempts for 15 minutes
         if failed_attempts >= 5:
-            update_data['locked_until'] = datetime.now(timezone.utc) + timedelta(minutes=15)
+            update_data['locked_until'] = now + timedelta(minutes=15)
             await db.users.update_one({"email": request.email.lower()}, {"$set": update_data})
             raise HTTPException(status_code=423, detail="Cuenta bloqueada por múltiples intentos fallidos. Intenta en 15 minutos.")
         
@@ -1327,14 +1431,15 @@ async def login_with_password(request: LoginWithPasswordRequest):
     
     # Invalidate all previous sessions for this user (single session policy)
     await db.user_sessions.delete_many({"user_id": user['user_id']})
+    forget_cached_sessions(user['user_id'])
     
     # Reset failed attempts and create new session
     session_token = secrets.token_urlsafe(32)
     session_data = {
         "user_id": user['user_id'],
         "session_token": session_token,
-        "created_at": datetime.now(timezone.utc),
-        "expires_at": datetime.now(timezone.utc) + timedelta(days=7),
+        "created_at": now,
+        "expires_at": now + timedelta(days=7),
         "login_method": "password"
     }
     await db.user_sessions.insert_one(session_data)
@@ -1345,7 +1450,7 @@ async def login_with_password(request: LoginWithPasswordRequest):
         {"$set": {
             "failed_login_attempts": 0,
             "locked_until": None,
-            "last_login": datetime.now(timezone.utc)
+            "last_login": now
         }}
     )
     
@@ -1419,6 +1524,7 @@ async def verify_reset_token(email: str, token: str):
 @api_router.post("/auth/reset-password")
 async def reset_password(request: ResetPasswordRequest):
     """Reset password using temp token"""
+    now = datetime.now(timezone.utc)
     
     # Verify token first
     user = await db.users.find_one({"email": request.email.lower()})
@@ -1433,7 +1539,7 @@ async def reset_password(request: ResetPasswordRequest):
     if expires.tzinfo is None:
         expires = expires.replace(tzinfo=timezone.utc)
     
-    if expires < datetime.now(timezone.utc):
+    if expires < now:
         raise HTTPException(status_code=400, detail="Código expirado. Solicita uno nuevo.")
     
     # Verify token
@@ -1455,7 +1561,7 @@ async def reset_password(request: ResetPasswordRequest):
         {"$set": {
             "password_hash": hashed,
             "password_set": True,
-            "password_changed_at": datetime.now(timezone.utc),
+            "password_changed_at": now,
             "password_reset_token": None,
             "password_reset_expires": None,
             "failed_login_attempts": 0,
@@ -1465,6 +1571,7 @@ async def reset_password(request: ResetPasswordRequest):
     
     # Invalidate all sessions
     await db.user_sessions.delete_many({"user_id": user['user_id']})
+    forget_cached_sessions(user['user_id'])
     
     logger.info(f"Password reset for user {user['user_id']}")
     return {"message": "Contraseña actualizada exitosamente. Por favor inicia sesión."}
@@ -1472,8 +1579,9 @@ async def reset_password(request: ResetPasswordRequest):
 @api_router.post("/auth/change-password")
 async def change_password(request: ChangePasswordRequest, current_user: User = Depends(get_current_user)):
     """Change password - requires current password and live selfie"""
+    now = datetime.now(timezone.utc)
     
-    user = await db.users.find_one({"user_id": current_user.user_id})
+    user = await db.users.find_one({"user_id": current_user.user_id}, {"_id": 0, "password_hash": 1})
     
     # Verify current password
     if not user.get('password_hash') or not verify_password(request.current_password, user['password_hash']):
@@ -1500,7 +1608,7 @@ async def change_password(request: ChangePasswordRequest, current_user: User = D
         "user_id": current_user.user_id,
         "type": "password_change",
         "selfie_image": request.selfie_image,
-        "timestamp": datetime.now(timezone.utc),
+        "timestamp": now,
         "ip_address": None  # Could be added from request
     }
     await db.security_verifications.insert_one(verification_record)
@@ -1511,7 +1619,7 @@ async def change_password(request: ChangePasswordRequest, current_user: User = D
         {"user_id": current_user.user_id},
         {"$set": {
             "password_hash": hashed,
-            "password_changed_at": datetime.now(timezone.utc)
+            "password_changed_at": now
         }}
     )
     
@@ -1522,6 +1630,7 @@ async def change_password(request: ChangePasswordRequest, current_user: User = D
             "user_id": current_user.user_id,
             "_id": {"$ne": current_session['_id']}
         })
+        forget_cached_sessions(current_user.user_id)
     
     logger.info(f"Password changed for user {current_user.user_id}")
     return {"message": "Contraseña cambiada exitosamente"}
@@ -1529,7 +1638,9 @@ async def change_password(request: ChangePasswordRequest, current_user: User = D
 @api_router.get("/auth/password-status")
 async def get_password_status(current_user: User = Depends(get_current_user)):
     """Check if user has password set"""
-    user = await db.users.find_one({"user_id": current_user.user_id})
+    user = await db.users.find_one(
+        {"user_id": current_user.user_id}, {"_id": 0, "password_set": 1, "password_changed_at": 1}
+    )
     return {
         "password_set": user.get('password_set', False),
         "password_changed_at": user.get('password_changed_at')
@@ -1541,9 +1652,8 @@ async def get_password_status(current_user: User = Depends(get_current_user)):
 
 CURRENT_POLICIES_VERSION = "1.0"
 
-@api_router.get("/policies")
-async def get_policies():
-    """Get current policies text and version"""
+def _load_policies_body() -> bytes:
+    """Read the policies file once and pre-render the /policies response"""
     policies_path = Path(__file__).parent / 'policies' / 'POLITICAS_RIS.md'
     
     if policies_path.exists():
@@ -1552,15 +1662,28 @@ async def get_policies():
     else:
         policies_text = "Políticas no disponibles"
     
-    return {
+    return orjson.dumps({
         "version": CURRENT_POLICIES_VERSION,
         "content": policies_text,
         "last_updated": "2026-01-24"
-    }
+    })
+
+# The text only changes with a deploy, so it is served from memory and revalidated by ETag
+_POLICIES_BODY = _load_policies_body()
+_POLICIES_ETAG = f'"{hashlib.md5(_POLICIES_BODY).hexdigest()}"'
+_POLICIES_HEADERS = {"ETag": _POLICIES_ETAG, "Cache-Control": "public, max-age=3600"}
+
+@api_router.get("/policies")
+async def get_policies(request: Request):
+    """Get current policies text and version"""
+    if _POLICIES_ETAG in request.headers.get("if-none-match", ""):
+        return Response(status_code=304, headers=_POLICIES_HEADERS)
+    return Response(content=_POLICIES_BODY, media_type="application/json", headers=_POLICIES_HEADERS)
 
 @api_router.post("/policies/accept")
 async def accept_policies(request: Request, current_user: User = Depends(get_current_user)):
     """Accept policies - required before using the app"""
+    now = datetime.now(timezone.utc)
     try:
         # Get client IP
         forwarded_for = request.headers.get('X-Forwarded-For')
@@ -1571,17 +1694,18 @@ async def accept_policies(request: Request, current_user: User = Depends(get_cur
             {"$set": {
                 "accepted_policies": True,
                 "policies_version": CURRENT_POLICIES_VERSION,
-                "policies_accepted_at": datetime.now(timezone.utc),
+                "policies_accepted_at": now,
                 "policies_ip_address": client_ip
             }}
         )
+        forget_cached_sessions(current_user.user_id)
         
         logger.info(f"User {current_user.user_id} accepted policies v{CURRENT_POLICIES_VERSION} from IP {client_ip}")
         
         return {
             "message": "Políticas aceptadas exitosamente",
             "version": CURRENT_POLICIES_VERSION,
-            "accepted_at": datetime.now(timezone.utc).isoformat()
+            "accepted_at": now.isoformat()
         }
         
     except Exception as e:
@@ -1591,7 +1715,10 @@ async def accept_policies(request: Request, current_user: User = Depends(get_cur
 @api_router.get("/policies/status")
 async def get_policies_status(current_user: User = Depends(get_current_user)):
     """Check if user has accepted current policies"""
-    user = await db.users.find_one({"user_id": current_user.user_id})
+    user = await db.users.find_one(
+        {"user_id": current_user.user_id},
+        {"_id": 0, "accepted_policies": 1, "policies_version": 1, "policies_accepted_at": 1}
+    )
     
     if not user:
         raise HTTPException(status_code=404, detail="Usuario no encontrado")
@@ -1615,6 +1742,7 @@ async def get_policies_status(current_user: User = Depends(get_current_user)):
 @api_router.post("/verification/submit")
 async def submit_verification(request: VerificationRequest, current_user: User = Depends(get_current_user)):
     """Submit documents for verification"""
+    now = datetime.now(timezone.utc)
     
     # Check if CPF is already used by another user
     cpf_normalized = request.cpf_number.replace(".", "").replace("-", "").strip()
@@ -1639,14 +1767,17 @@ async def submit_verification(request: VerificationRequest, current_user: User =
             "picture": request.selfie_image,  # Selfie becomes permanent profile picture
             "picture_locked": True,  # Mark picture as locked/unchangeable
             "verification_status": "pending",
-            "verification_submitted_at": datetime.now(timezone.utc),
+            "verification_submitted_at": now,
             "accepted_declaration": True,
-            "declaration_accepted_at": datetime.now(timezone.utc)
+            "declaration_accepted_at": now
         }}
     )
+    forget_cached_sessions(current_user.user_id)
     
     # Create notification for all admins about new verification
-    admins = await db.users.find({"role": {"$in": ["admin", "super_admin"]}}).to_list(100)
+    admins = await db.users.find(
+        {"role": ADMIN_ROLE_FILTER}, {"_id": 0, "user_id": 1, "fcm_token": 1}
+    ).to_list(100)
     for admin in admins:
         admin_notification = {
             "notification_id": f"notif_{uuid.uuid4().hex[:12]}",
@@ -1661,7 +1792,7 @@ async def submit_verification(request: VerificationRequest, current_user: User =
                 "user_email": current_user.email
             },
             "read": False,
-            "created_at": datetime.now(timezone.utc)
+            "created_at": now
         }
         await db.notifications.insert_one(admin_notification)
         
@@ -1684,7 +1815,7 @@ async def submit_verification(request: VerificationRequest, current_user: User =
         "message": "Tu documentación ha sido enviada exitosamente. Recibirás una respuesta en minutos.",
         "type": "verification_submitted",
         "read": False,
-        "created_at": datetime.now(timezone.utc)
+        "created_at": now
     }
     await db.notifications.insert_one(user_notification)
     
@@ -1695,10 +1826,14 @@ async def submit_verification(request: VerificationRequest, current_user: User =
 @api_router.get("/verification/status")
 async def get_verification_status(current_user: User = Depends(get_current_user)):
     """Get current verification status"""
-    user = await db.users.find_one({"user_id": current_user.user_id})
-    
-    # Check if documents were submitted
-    documents_submitted = user.get("verification_submitted_at") is not None or user.get("id_document_image") is not None
+    # Check if documents were submitted (without pulling the document image itself)
+    documents_submitted = await db.users.count_documents({
+        "user_id": current_user.user_id,
+        "$or": [
+            {"verification_submitted_at": {"$ne": None}},
+            {"id_document_image": {"$ne": None}}
+        ]
+    }, limit=1) > 0
     
     return {
         "status": current_user.verification_status,
@@ -1731,9 +1866,10 @@ async def get_pending_verifications(admin_user: User = Depends(get_admin_user)):
 @api_router.post("/admin/verifications/decide")
 async def decide_verification(decision: VerificationDecision, admin_user: User = Depends(get_admin_user)):
     """Admin: Approve or reject verification"""
+    now = datetime.now(timezone.utc)
     update_data = {
         "verification_status": "verified" if decision.approved else "rejected",
-        "verified_at": datetime.now(timezone.utc) if decision.approved else None,
+        "verified_at": now if decision.approved else None,
         "verified_by": admin_user.user_id if decision.approved else None,
         "rejection_reason": decision.rejection_reason if not decision.approved else None
     }
@@ -1745,6 +1881,7 @@ async def decide_verification(decision: VerificationDecision, admin_user: User =
     
     if result.modified_count == 0:
         raise HTTPException(status_code=404, detail="User not found")
+    forget_cached_sessions(decision.user_id)
     
     # Get user info for notification
     user = await db.users.find_one({"user_id": decision.user_id})
@@ -1759,7 +1896,7 @@ async def decide_verification(decision: VerificationDecision, admin_user: User =
             "type": "verification_approved",
             "priority": "high",
             "read": False,
-            "created_at": datetime.now(timezone.utc)
+            "created_at": now
         }
     else:
         notification = {
@@ -1770,7 +1907,7 @@ async def decide_verification(decision: VerificationDecision, admin_user: User =
             "type": "verification_rejected",
             "priority": "high",
             "read": False,
-            "created_at": datetime.now(timezone.utc)
+            "created_at": now
         }
     
     await db.notifications.insert_one(notification)
@@ -1794,20 +1931,57 @@ async def decide_verification(decision: VerificationDecision, admin_user: User =
 
 @api_router.get("/user/balance")
 async def get_balance(current_user: User = Depends(get_current_user)):
-    return {"balance_ris": current_user.balance_ris}
+    # Read from DB, the authenticated user may come from the session cache
+    user = await db.users.find_one({"user_id": current_user.user_id}, {"_id": 0, "balance_ris": 1})
+    return {"balance_ris": user.get("balance_ris", 0) if user else current_user.balance_ris}
 
 # =======================
 # EXCHANGE RATE ROUTES
 # =======================
 
+# Dashboard rate read from settings, rarely written
+RATE_CACHE_TTL_SECONDS = 60
+_rate_cache = {"val": 78, "ts": 0.0}
+
+async def get_cached_rate():
+    """Return the dashboard exchange rate, refreshed at most once per TTL"""
+    if time.monotonic() - _rate_cache["ts"] < RATE_CACHE_TTL_SECONDS:
+        return _rate_cache["val"]
+    doc = await db.settings.find_one({"key": "exchange_rate"})
+    _rate_cache["val"] = doc.get("ris_to_ves", 78) if doc else 78
+    _rate_cache["ts"] = time.monotonic()
+    return _rate_cache["val"]
+
+# Current exchange_rates document, shared by GET /rate and withdrawals
+EXCHANGE_RATES_CACHE_TTL_SECONDS = 30
+_exchange_rates_cache = {"value": None, "exp": 0.0}
+
+async def get_exchange_rates_doc() -> Optional[dict]:
+    """Return the exchange_rates document, re-read at most once per TTL"""
+    if time.monotonic() < _exchange_rates_cache["exp"]:
+        return _exchange_rates_cache["value"]
+    doc = await db.exchange_rates.find_one({}, {"_id": 0})
+    _exchange_rates_cache["value"] = doc
+    _exchange_rates_cache["exp"] = time.monotonic() + EXCHANGE_RATES_CACHE_TTL_SECONDS
+    return doc
+
+def invalidate_exchange_rates_cache():
+    """Force the next rate read to hit MongoDB"""
+    _exchange_rates_cache["exp"] = 0.0
+    _rate_cache["ts"] = 0.0
+
+# The admin panel's /admin/settings/rate writes exchange_rates too
+rate_update_hooks.append(invalidate_exchange_rates_cache)
+
 @api_router.get("/rate")
 async def get_rate():
     """Get all exchange rates"""
-    rate_doc = await db.exchange_rates.find_one({}, {"_id": 0})
+    rate_doc = await get_exchange_rates_doc()
     if not rate_doc:
         # Create default rates
         default_rate = ExchangeRate()
         await db.exchange_rates.insert_one(default_rate.dict())
+        invalidate_exchange_rates_cache()
         return default_rate.dict()
     
     # Ensure all rate fields exist
@@ -1848,6 +2022,7 @@ async def update_rate(request: UpdateAllRatesRequest, admin_user: User = Depends
     }
     await db.exchange_rates.delete_many({})
     await db.exchange_rates.insert_one(new_rate)
+    invalidate_exchange_rates_cache()
     # Return without _id
     return {
         "ris_to_ves": new_rate["ris_to_ves"],
@@ -1872,13 +2047,17 @@ async def create_beneficiary(beneficiary: BeneficiaryCreate, current_user: User
     return new_beneficiary
 
 @api_router.get("/beneficiaries")
-async def get_beneficiaries(current_user: User = Depends(get_current_user)):
-    """Get all beneficiaries for current user"""
-    beneficiaries = await db.beneficiaries.find(
-        {"user_id": current_user.user_id},
-        {"_id": 0}
-    ).to_list(1000)
-    return [Beneficiary(**b) for b in beneficiaries]
+async def get_beneficiaries(
+    response: Response,
+    current_user: User = Depends(get_current_user),
+    limit: int = Query(LIST_PAGE_MAX, ge=1, le=LIST_PAGE_MAX),
+    cursor: Optional[str] = None
+):
+    """Get beneficiaries for current user, newest first"""
+    beneficiaries = await fetch_page(
+        db.beneficiaries, {"user_id": current_user.user_id}, None, limit, cursor, response
+    )
+    return page_json(Beneficiary, beneficiaries, response)
 
 @api_router.delete("/beneficiaries/{beneficiary_id}")
 async def delete_beneficiary(beneficiary_id: str, current_user: User = Depends(get_current_user)):
@@ -1903,19 +2082,53 @@ async def delete_beneficiary(beneficiary_id: str, current_user: User = Depends(g
 # WITHDRAWAL ROUTES
 # =======================
 
+# Strong references so fire-and-forget tasks aren't garbage collected mid-flight
+_background_tasks: set = set()
+
+def spawn_background(coro):
+    """Run a coroutine without blocking the response"""
+    task = asyncio.create_task(coro)
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+    return task
+
+def _send_team_whatsapp(message: str, to: Optional[str] = None):
+    """Blocking Twilio WhatsApp send, to the team number by default (runs in a worker thread)"""
+    if not twilio_client:
+        raise RuntimeError("Twilio not configured")
+    
+    twilio_client.messages.create(
+        from_=TWILIO_WHATSAPP_FROM,
+        body=message,
+        to=to or TWILIO_WHATSAPP_TO
+    )
+
+async def _safe_whatsapp_notify(message: str, to: Optional[str] = None):
+    """Send a WhatsApp message off the event loop, logging instead of raising"""
+    try:
+        await asyncio.to_thread(_send_team_whatsapp, message, to)
+    except Exception as e:
+        logger.error("WhatsApp notification error: %s", e)
+
 @api_router.post("/withdrawal/create")
 async def create_withdrawal(request: WithdrawalRequest, current_user: User = Depends(get_current_user)):
     """Create withdrawal request (RIS -> VES)"""
     # Get current rate
-    rate_doc = await db.exchange_rates.find_one({}, {"_id": 0})
+    rate_doc = await get_exchange_rates_doc()
     if not rate_doc:
         rate = 78.0
     else:
         rate = rate_doc["ris_to_ves"]
     
-    # Check if user has enough balance
-    if current_user.balance_ris < request.amount_ris:
+    # Deduct RIS only if the stored balance covers it (no double-spend between
+    # concurrent requests)
+    result = await db.users.update_one(
+        {"user_id": current_user.user_id, "balance_ris": {"$gte": request.amount_ris}},
+        {"$inc": {"balance_ris": -request.amount_ris}}
+    )
+    if result.modified_count == 0:
         raise HTTPException(status_code=400, detail="Insufficient balance")
+    forget_cached_sessions(current_user.user_id)
     
     # Calculate VES amount
     amount_ves = request.amount_ris * rate
@@ -1929,13 +2142,16 @@ async def create_withdrawal(request: WithdrawalRequest, current_user: User = Dep
         amount_output=amount_ves,
         beneficiary_data=request.beneficiary_data
     )
-    await db.transactions.insert_one(transaction.dict())
-    
-    # Immediately deduct RIS from balance
-    await db.users.update_one(
-        {"user_id": current_user.user_id},
-        {"$inc": {"balance_ris": -request.amount_ris}}
-    )
+    try:
+        await db.transactions.insert_one(transaction.dict())
+    except Exception:
+        # Give the money back if the withdrawal could not be recorded
+        await db.users.update_one(
+            {"user_id": current_user.user_id},
+            {"$inc": {"balance_ris": request.amount_ris}}
+        )
+        forget_cached_sessions(current_user.user_id)
+        raise
     
     # Send WhatsApp notification to team with transaction ID
     try:
@@ -1963,30 +2179,26 @@ async def create_withdrawal(request: WithdrawalRequest, current_user: User = Dep
 ---
 ✅ Responde con foto del comprobante para completar"""
 
-        from twilio.rest import Client
-        twilio_client = Client(
-            os.getenv('TWILIO_ACCOUNT_SID'),
-            os.getenv('TWILIO_AUTH_TOKEN')
-        )
-        
-        twilio_client.messages.create(
-            from_=os.getenv('TWILIO_WHATSAPP_FROM'),
-            body=message,
-            to=os.getenv('TWILIO_WHATSAPP_TO')
-        )
+        # The alert doesn't affect the response, don't make the user wait for Twilio
+        spawn_background(_safe_whatsapp_notify(message))
     except Exception as e:
-        logger.error(f"WhatsApp notification error: {e}")
+        logger.error("WhatsApp notification error: %s", e)
     
     return transaction
 
 @api_router.get("/withdrawal/pending")
-async def get_pending_withdrawals(admin_user: User = Depends(get_admin_user)):
-    """Admin: Get all pending withdrawals"""
-    withdrawals = await db.transactions.find(
-        {"type": "withdrawal", "status": "pending"},
-        {"_id": 0}
-    ).to_list(1000)
-    return [Transaction(**w) for w in withdrawals]
+async def get_pending_withdrawals(
+    response: Response,
+    admin_user: User = Depends(get_admin_user),
+    limit: int = Query(LIST_PAGE_MAX, ge=1, le=LIST_PAGE_MAX),
+    cursor: Optional[str] = None
+):
+    """Admin: Get pending withdrawals, newest first"""
+    withdrawals = await fetch_page(
+        db.transactions, {"type": "withdrawal", "status": "pending"},
+        TRANSACTION_LIST_PROJECTION, limit, cursor, response
+    )
+    return page_json(Transaction, withdrawals, response)
 
 @api_router.post("/withdrawal/process")
 async def process_withdrawal(request: ProcessWithdrawalRequest, admin_user: User = Depends(get_admin_user)):
@@ -2022,6 +2234,7 @@ class VESRechargeRequest(BaseModel):
 @api_router.post("/recharge/ves")
 async def create_ves_recharge(request: VESRechargeRequest, current_user: User = Depends(get_current_user)):
     """Create a VES recharge request (manual payment with voucher upload)"""
+    now = datetime.now(timezone.utc)
     
     # Validate amounts
     if request.amount_ves <= 0 or request.amount_ris <= 0:
@@ -2036,7 +2249,7 @@ async def create_ves_recharge(request: VESRechargeRequest, current_user: User =
         raise HTTPException(status_code=400, detail="Debes adjuntar el comprobante de pago")
     
     # Generate transaction ID
-    transaction_id = str(uuid.uuid4())
+    transaction_id = new_uuid()
     
     # Create transaction with pending_manual_approval status
     transaction_data = {
@@ -2048,14 +2261,14 @@ async def create_ves_recharge(request: VESRechargeRequest, current_user: User =
         "amount_input": request.amount_ves,  # VES paid
         "amount_output": request.amount_ris,  # RIS to receive
         "voucher_image": request.voucher_image,
-        "created_at": datetime.now(timezone.utc),
-        "updated_at": datetime.now(timezone.utc)
+        "created_at": now,
+        "updated_at": now
     }
     
     await db.transactions.insert_one(transaction_data)
     
     # Create notification for admins
-    admins = await db.users.find({"role": {"$in": ["admin", "super_admin"]}}).to_list(100)
+    admins = await db.users.find({"role": ADMIN_ROLE_FILTER}, {"_id": 0, "user_id": 1}).to_list(100)
     for admin in admins:
         admin_notification = {
             "notification_id": f"notif_{uuid.uuid4().hex[:12]}",
@@ -2071,7 +2284,7 @@ async def create_ves_recharge(request: VESRechargeRequest, current_user: User =
                 "amount_ris": request.amount_ris
             },
             "read": False,
-            "created_at": datetime.now(timezone.utc)
+            "created_at": now
         }
         await db.notifications.insert_one(admin_notification)
     
@@ -2083,7 +2296,7 @@ async def create_ves_recharge(request: VESRechargeRequest, current_user: User =
         "message": f"Tu recarga de {request.amount_ves:.2f} VES está siendo procesada. Te notificaremos cuando sea aprobada.",
         "type": "ves_recharge_submitted",
         "read": False,
-        "created_at": datetime.now(timezone.utc)
+        "created_at": now
     }
     await db.notifications.insert_one(user_notification)
     
@@ -2120,10 +2333,11 @@ async def get_pending_ves_recharges(admin_user: User = Depends(get_admin_user)):
         {"_id": 0}
     ).sort("created_at", -1).to_list(1000)
     
-    # Get user info for each recharge
+    # Get user info for all recharges in one query
+    users_map = await get_users_map((r["user_id"] for r in recharges), fields=("name", "email", "picture"))
     result = []
     for r in recharges:
-        user = await db.users.find_one({"user_id": r["user_id"]}, {"_id": 0, "name": 1, "email": 1, "picture": 1})
+        user = users_map.get(r["user_id"])
         r["user_name"] = user.get("name") if user else "Usuario"
         r["user_email"] = user.get("email") if user else ""
         r["user_picture"] = user.get("picture") if user else None
@@ -2140,13 +2354,31 @@ class ApproveVESRechargeRequest(BaseModel):
 @api_router.post("/admin/recharges/ves/approve")
 async def approve_ves_recharge(request: ApproveVESRechargeRequest, admin_user: User = Depends(get_admin_user)):
     """Admin: Approve or reject a VES recharge"""
+    now = datetime.now(timezone.utc)
     
-    # Find the transaction
-    transaction = await db.transactions.find_one({"transaction_id": request.transaction_id})
-    if not transaction:
-        raise HTTPException(status_code=404, detail="Transacción no encontrada")
+    if request.approved:
+        # Claim and fetch the transaction in one call so a repeated approval can't credit twice
+        transaction = await db.transactions.find_one_and_update(
+            {"transaction_id": request.transaction_id, "status": "pending_manual_approval"},
+            {"$set": {
+                "status": "completed",
+                "processed_by": admin_user.user_id,
+                "completed_at": now,
+                "updated_at": now
+            }},
+            projection={"_id": 0, "user_id": 1, "amount_output": 1, "amount_input": 1},
+            return_document=ReturnDocument.AFTER
+        )
+    else:
+        transaction = await db.transactions.find_one(
+            {"transaction_id": request.transaction_id, "status": "pending_manual_approval"},
+            {"_id": 0, "user_id": 1, "amount_output": 1, "amount_input": 1}
+        )
     
-    if transaction.get("status") != "pending_manual_approval":
+    if not transaction:
+        exists = await db.transactions.count_documents({"transaction_id": request.transaction_id}, limit=1)
+        if not exists:
+            raise HTTPException(status_code=404, detail="Transacción no encontrada")
         raise HTTPException(status_code=400, detail="Esta transacción ya fue procesada")
     
     user_id = transaction["user_id"]
@@ -2159,17 +2391,7 @@ async def approve_ves_recharge(request: ApproveVESRechargeRequest, admin_user: U
             {"user_id": user_id},
             {"$inc": {"balance_ris": amount_ris}}
         )
-        
-        # Update transaction status
-        await db.transactions.update_one(
-            {"transaction_id": request.transaction_id},
-            {"$set": {
-                "status": "completed",
-                "processed_by": admin_user.user_id,
-                "completed_at": datetime.now(timezone.utc),
-                "updated_at": datetime.now(timezone.utc)
-            }}
-        )
+        forget_cached_sessions(user_id)
         
         # Notify user
         await create_notification(
@@ -2191,8 +2413,8 @@ async def approve_ves_recharge(request: ApproveVESRechargeRequest, admin_user: U
                 "status": "rejected",
                 "rejection_reason": request.rejection_reason or "Rechazado por administrador",
                 "processed_by": admin_user.user_id,
-                "completed_at": datetime.now(timezone.utc),
-                "updated_at": datetime.now(timezone.utc)
+                "completed_at": now,
+                "updated_at": now
             }}
         )
         
@@ -2222,6 +2444,7 @@ class PixRechargeRequest(BaseModel):
 @api_router.post("/pix/create")
 async def create_pix_payment(request: PixRechargeRequest, current_user: User = Depends(get_current_user)):
     """Create a PIX payment for recharging RIS balance"""
+    now = datetime.now(timezone.utc)
     
     # Validate amount (min 10, max 2000 BRL)
     if request.amount_brl < 10:
@@ -2251,15 +2474,16 @@ async def create_pix_payment(request: PixRechargeRequest, current_user: User = D
         )
     
     # Generate unique transaction ID
-    transaction_id = str(uuid.uuid4())
+    transaction_id = new_uuid()
     
     # Get user name parts
     name_parts = current_user.name.split(" ", 1)
     first_name = name_parts[0]
     last_name = name_parts[1] if len(name_parts) > 1 else first_name
     
-    # Create PIX payment with Mercado Pago
-    pix_result = mercadopago_service.create_pix_payment(
+    # Create PIX payment with Mercado Pago (blocking SDK call, run off the event loop)
+    pix_result = await asyncio.to_thread(
+        mercadopago_service.create_pix_payment,
         amount=request.amount_brl,
         description=f"Recarga RIS - {request.amount_brl} BRL",
         payer_email=current_user.email,
@@ -2286,8 +2510,8 @@ async def create_pix_payment(request: PixRechargeRequest, current_user: User = D
         "pix_qr_code": pix_result.get("qr_code"),
         "pix_qr_code_base64": pix_result.get("qr_code_base64"),
         "pix_expiration": pix_result.get("expiration"),
-        "created_at": datetime.now(timezone.utc),
-        "updated_at": datetime.now(timezone.utc)
+        "created_at": now,
+        "updated_at": now
     }
     
     await db.transactions.insert_one(transaction_data)
@@ -2308,6 +2532,7 @@ async def create_pix_payment(request: PixRechargeRequest, current_user: User = D
 @api_router.get("/pix/status/{transaction_id}")
 async def get_pix_status(transaction_id: str, current_user: User = Depends(get_current_user)):
     """Check PIX payment status"""
+    now = datetime.now(timezone.utc)
     
     # Find transaction
     transaction = await db.transactions.find_one({
@@ -2329,34 +2554,35 @@ async def get_pix_status(transaction_id: str, current_user: User = Depends(get_c
     # Check with Mercado Pago
     payment_id = transaction.get("mercadopago_payment_id")
     if payment_id:
-        payment_status = mercadopago_service.get_payment_status(payment_id)
+        payment_status = await asyncio.to_thread(mercadopago_service.get_payment_status, payment_id)
         
         if payment_status and payment_status.get("status") == "approved":
             # Payment approved - credit user's balance
             amount_ris = transaction.get("amount_output", 0)
             
-            # Update user balance
-            await db.users.update_one(
-                {"user_id": current_user.user_id},
-                {"$inc": {"balance_ris": amount_ris}}
-            )
-            
-            # Update transaction status
-            await db.transactions.update_one(
-                {"transaction_id": transaction_id},
+            # Complete the transaction only if it is still in the state we read; the
+            # Mercado Pago webhook or another poll may have credited it meanwhile
+            claimed = await db.transactions.update_one(
+                {"transaction_id": transaction_id, "status": transaction.get("status")},
                 {"$set": {
                     "status": "completed",
-                    "completed_at": datetime.now(timezone.utc),
-                    "updated_at": datetime.now(timezone.utc)
+                    "completed_at": now,
+                    "updated_at": now
                 }}
             )
             
-            logger.info(f"PIX payment completed for user {current_user.user_id}: +{amount_ris} RIS")
+            if claimed.modified_count:
+                await db.users.update_one(
+                    {"user_id": current_user.user_id},
+                    {"$inc": {"balance_ris": amount_ris}}
+                )
+                forget_cached_sessions(current_user.user_id)
+                logger.info(f"PIX payment completed for user {current_user.user_id}: +{amount_ris} RIS")
             
             return {
                 "status": "completed",
                 "amount_ris": amount_ris,
-                "completed_at": datetime.now(timezone.utc).isoformat()
+                "completed_at": now.isoformat()
             }
         
         return {
@@ -2374,6 +2600,7 @@ class PixUploadProofRequest(BaseModel):
 @api_router.post("/pix/upload-proof")
 async def upload_pix_proof(request: PixUploadProofRequest, current_user: User = Depends(get_current_user)):
     """Upload proof of PIX payment for manual verification"""
+    now = datetime.now(timezone.utc)
     
     # Find transaction
     transaction = await db.transactions.find_one({
@@ -2391,29 +2618,33 @@ async def upload_pix_proof(request: PixUploadProofRequest, current_user: User =
     is_auto_approved = False
     
     if payment_id:
-        payment_status = mercadopago_service.get_payment_status(payment_id)
+        payment_status = await asyncio.to_thread(mercadopago_service.get_payment_status, payment_id)
         if payment_status and payment_status.get("status") == "approved":
             is_auto_approved = True
     
     amount_ris = transaction.get("amount_output", 0)
     
     if is_auto_approved:
-        # Payment already approved by Mercado Pago - complete immediately
-        await db.users.update_one(
-            {"user_id": current_user.user_id},
-            {"$inc": {"balance_ris": amount_ris}}
-        )
-        
-        await db.transactions.update_one(
-            {"transaction_id": request.transaction_id},
+        # Payment already approved by Mercado Pago - complete immediately, but only
+        # if the webhook hasn't completed (and credited) it in the meantime
+        claimed = await db.transactions.update_one(
+            {"transaction_id": request.transaction_id, "status": "pending"},
             {"$set": {
                 "status": "completed",
                 "proof_image": request.proof_image,
-                "completed_at": datetime.now(timezone.utc),
-                "updated_at": datetime.now(timezone.utc),
+                "completed_at": now,
+                "updated_at": now,
                 "auto_approved": True
             }}
         )
+        if claimed.modified_count == 0:
+            raise HTTPException(status_code=404, detail="Transacción no encontrada o ya procesada")
+        
+        await db.users.update_one(
+            {"user_id": current_user.user_id},
+            {"$inc": {"balance_ris": amount_ris}}
+        )
+        forget_cached_sessions(current_user.user_id)
         
         # Notify user
         await create_notification(
@@ -2438,13 +2669,13 @@ async def upload_pix_proof(request: PixUploadProofRequest, current_user: User =
         {"$set": {
             "status": "pending_review",
             "proof_image": request.proof_image,
-            "proof_uploaded_at": datetime.now(timezone.utc),
-            "updated_at": datetime.now(timezone.utc)
+            "proof_uploaded_at": now,
+            "updated_at": now
         }}
     )
     
     # Notify admins about pending review
-    admins = await db.users.find({"role": {"$in": ["admin", "super_admin"]}}).to_list(100)
+    admins = await db.users.find({"role": ADMIN_ROLE_FILTER}, {"_id": 0, "user_id": 1}).to_list(100)
     for admin in admins:
         await create_notification(
             user_id=admin["user_id"],
@@ -2468,6 +2699,7 @@ class PixCancelRequest(BaseModel):
 @api_router.post("/pix/cancel")
 async def cancel_pix_payment(request: PixCancelRequest, current_user: User = Depends(get_current_user)):
     """Cancel a pending PIX payment"""
+    now = datetime.now(timezone.utc)
     
     # Find transaction
     transaction = await db.transactions.find_one({
@@ -2485,9 +2717,9 @@ async def cancel_pix_payment(request: PixCancelRequest, current_user: User = Dep
         {"transaction_id": request.transaction_id},
         {"$set": {
             "status": "cancelled",
-            "cancelled_at": datetime.now(timezone.utc),
+            "cancelled_at": now,
             "cancelled_by": "user",
-            "updated_at": datetime.now(timezone.utc)
+            "updated_at": now
         }}
     )
     
@@ -2498,6 +2730,7 @@ async def cancel_pix_payment(request: PixCancelRequest, current_user: User = Dep
 @api_router.get("/pix/pending")
 async def get_pending_pix(current_user: User = Depends(get_current_user)):
     """Get any pending PIX transaction for the current user"""
+    now = datetime.now(timezone.utc)
     
     # Find pending PIX transaction (either pending or pending_review)
     pending_tx = await db.transactions.find_one(
@@ -2521,15 +2754,15 @@ async def get_pending_pix(current_user: User = Depends(get_current_user)):
             created_at = created_at.replace(tzinfo=timezone.utc)
         expiration_time = created_at + timedelta(minutes=30)
         
-        if datetime.now(timezone.utc) > expiration_time:
+        if now > expiration_time:
             # Mark as expired if not already
             if pending_tx.get("status") == "pending":
                 await db.transactions.update_one(
                     {"transaction_id": pending_tx["transaction_id"]},
                     {"$set": {
                         "status": "expired",
-                        "expired_at": datetime.now(timezone.utc),
-                        "updated_at": datetime.now(timezone.utc)
+                        "expired_at": now,
+                        "updated_at": now
                     }}
                 )
                 return {"has_pending": False, "pending_transaction": None}
@@ -2561,6 +2794,7 @@ class PixVerifyWithProofRequest(BaseModel):
 @api_router.post("/pix/verify-with-proof")
 async def verify_pix_with_proof(request: PixVerifyWithProofRequest, current_user: User = Depends(get_current_user)):
     """Verify PIX payment manually with proof of payment image"""
+    now = datetime.now(timezone.utc)
     
     # Find transaction
     transaction = await db.transactions.find_one({
@@ -2578,29 +2812,33 @@ async def verify_pix_with_proof(request: PixVerifyWithProofRequest, current_user
     is_auto_approved = False
     
     if payment_id:
-        payment_status = mercadopago_service.get_payment_status(payment_id)
+        payment_status = await asyncio.to_thread(mercadopago_service.get_payment_status, payment_id)
         if payment_status and payment_status.get("status") == "approved":
             is_auto_approved = True
     
     amount_ris = transaction.get("amount_output", 0)
     
     if is_auto_approved:
-        # Payment already approved by Mercado Pago - complete immediately
-        await db.users.update_one(
-            {"user_id": current_user.user_id},
-            {"$inc": {"balance_ris": amount_ris}}
-        )
-        
-        await db.transactions.update_one(
-            {"transaction_id": request.transaction_id},
+        # Payment already approved by Mercado Pago - complete immediately, but only
+        # if the webhook hasn't completed (and credited) it in the meantime
+        claimed = await db.transactions.update_one(
+            {"transaction_id": request.transaction_id, "status": "pending"},
             {"$set": {
                 "status": "completed",
                 "proof_image": request.proof_image,
-                "completed_at": datetime.now(timezone.utc),
-                "updated_at": datetime.now(timezone.utc),
+                "completed_at": now,
+                "updated_at": now,
                 "verification_method": "auto_mercadopago_with_proof"
             }}
         )
+        if claimed.modified_count == 0:
+            raise HTTPException(status_code=404, detail="Transacción no encontrada o ya procesada")
+        
+        await db.users.update_one(
+            {"user_id": current_user.user_id},
+            {"$inc": {"balance_ris": amount_ris}}
+        )
+        forget_cached_sessions(current_user.user_id)
         
         logger.info(f"PIX payment auto-completed with proof for user {current_user.user_id}: +{amount_ris} RIS")
         
@@ -2616,7 +2854,7 @@ async def verify_pix_with_proof(request: PixVerifyWithProofRequest, current_user
             {"$set": {
                 "status": "pending_review",
                 "proof_image": request.proof_image,
-                "updated_at": datetime.now(timezone.utc),
+                "updated_at": now,
                 "verification_method": "manual_proof"
             }}
         )
@@ -2640,6 +2878,7 @@ async def verify_pix_with_proof(request: PixVerifyWithProofRequest, current_user
 @api_router.post("/pix/cancel/{transaction_id}")
 async def cancel_pix_payment(transaction_id: str, current_user: User = Depends(get_current_user)):
     """Cancel a pending PIX payment that was not completed"""
+    now = datetime.now(timezone.utc)
     
     # Find the pending transaction
     transaction = await db.transactions.find_one({
@@ -2661,9 +2900,9 @@ async def cancel_pix_payment(transaction_id: str, current_user: User = Depends(g
         {"transaction_id": transaction_id},
         {"$set": {
             "status": "cancelled",
-            "cancelled_at": datetime.now(timezone.utc),
+            "cancelled_at": now,
             "cancelled_by": "user",
-            "updated_at": datetime.now(timezone.utc)
+            "updated_at": now
         }}
     )
     
@@ -2701,6 +2940,42 @@ async def get_transaction_proof(transaction_id: str, current_user: User = Depend
         "completed_at": transaction.get("completed_at")
     }
 
+_DATA_URI_RE = re.compile(r'^data:([\w.+-]+/[\w.+-]+);base64,', re.IGNORECASE)
+
+def _decode_data_uri(data_uri: str) -> tuple[str, bytes]:
+    """Split a stored base64 data URI into (content type, raw bytes); CPU-bound"""
+    match = _DATA_URI_RE.match(data_uri)
+    if not match:
+        return "image/jpeg", base64.b64decode(data_uri)
+    return match.group(1), base64.b64decode(data_uri[match.end():])
+
+@api_router.get("/transaction/{transaction_id}/proof/image")
+async def get_transaction_proof_image(transaction_id: str, current_user: User = Depends(get_current_user)):
+    """Get the proof as raw image bytes (a third smaller on the wire than the base64 JSON)"""
+    transaction = await db.transactions.find_one(
+        {"transaction_id": transaction_id, "user_id": current_user.user_id},
+        {"_id": 0, "proof_image": 1}
+    )
+    
+    if not transaction:
+        raise HTTPException(status_code=404, detail="Transacción no encontrada")
+    
+    if not transaction.get("proof_image"):
+        raise HTTPException(status_code=404, detail="Esta transacción no tiene comprobante")
+    
+    try:
+        content_type, content = await asyncio.to_thread(_decode_data_uri, transaction["proof_image"])
+    except ValueError:
+        raise HTTPException(status_code=500, detail="Comprobante dañado")
+    
+    return Response(content=content, media_type=content_type, headers={"Cache-Control": "private, max-age=300"})
+
+# Mercado Pago sends several notifications per payment (created, updated, retries).
+# Approved payments already applied here are skipped without another API call.
+MP_HANDLED_TTL_SECONDS = 24 * 3600
+MP_HANDLED_MAX_ENTRIES = 10000
+_mp_handled_payments: dict[str, float] = {}
+
 @api_router.post("/webhooks/mercadopago")
 async def mercadopago_webhook(request: Request):
     """Webhook to receive Mercado Pago payment notifications"""
@@ -2714,40 +2989,46 @@ async def mercadopago_webhook(request: Request):
             payment_id = data.get("data", {}).get("id")
             
             if payment_id:
+                payment_key = str(payment_id)
+                handled_at = _mp_handled_payments.get(payment_key)
+                if handled_at and time.monotonic() - handled_at < MP_HANDLED_TTL_SECONDS:
+                    return {"status": "ok"}
+                
                 # Get payment details
-                payment_status = mercadopago_service.get_payment_status(payment_id)
+                payment_status = await asyncio.to_thread(mercadopago_service.get_payment_status, payment_id)
                 
                 if payment_status and payment_status.get("status") == "approved":
                     external_reference = payment_status.get("external_reference")
                     
                     if external_reference:
-                        # Find and update transaction
-                        transaction = await db.transactions.find_one({
-                            "transaction_id": external_reference,
-                            "status": "pending"
-                        })
+                        # Atomically claim the pending transaction; Mercado Pago
+                        # retries can't match it again, so the credit happens once
+                        now = datetime.now(timezone.utc)
+                        transaction = await db.transactions.find_one_and_update(
+                            {"transaction_id": external_reference, "status": "pending"},
+                            {"$set": {
+                                "status": "completed",
+                                "completed_at": now,
+                                "updated_at": now
+                            }},
+                            projection={"_id": 0, "user_id": 1, "amount_output": 1},
+                            return_document=ReturnDocument.AFTER
+                        )
                         
                         if transaction:
-                            amount_ris = transaction.get("amount_output", 0)
-                            user_id = transaction.get("user_id")
-                            
                             # Update user balance
                             await db.users.update_one(
-                                {"user_id": user_id},
-                                {"$inc": {"balance_ris": amount_ris}}
-                            )
-                            
-                            # Update transaction status
-                            await db.transactions.update_one(
-                                {"transaction_id": external_reference},
-                                {"$set": {
-                                    "status": "completed",
-                                    "completed_at": datetime.now(timezone.utc),
-                                    "updated_at": datetime.now(timezone.utc)
-                                }}
+                                {"user_id": transaction.get("user_id")},
+                                {"$inc": {"balance_ris": transaction.get("amount_output", 0)}}
                             )
+                            forget_cached_sessions(transaction["user_id"])
                             
                             logger.info(f"PIX payment auto-completed via webhook: {external_reference}")
+                        
+                        # Credited now, or no longer pending: repeats of this payment are no-ops
+                        if len(_mp_handled_payments) >= MP_HANDLED_MAX_ENTRIES:
+                            _mp_handled_payments.clear()
+                        _mp_handled_payments[payment_key] = time.monotonic()
         
         return {"status": "ok"}
         
@@ -2789,19 +3070,14 @@ async def send_support_message(request: SupportMessageRequest, current_user: Use
         }
         result = await db.support_messages.insert_one(support_record)
         message_id = str(result.inserted_id)
+        # A newer open thread exists now; untagged admin replies must re-resolve
+        # their target instead of going to the user they answered last
+        _admin_target_cache.clear()
         
         # Intentar enviar por WhatsApp (opcional)
         whatsapp_sent = False
         try:
-            twilio_sid = os.getenv('TWILIO_ACCOUNT_SID')
-            twilio_token = os.getenv('TWILIO_AUTH_TOKEN')
-            whatsapp_from = os.getenv('TWILIO_WHATSAPP_FROM')
-            whatsapp_to = os.getenv('TWILIO_WHATSAPP_TO')
-            
-            if twilio_sid and twilio_token and whatsapp_from and whatsapp_to:
-                from twilio.rest import Client
-                twilio_client = Client(twilio_sid, twilio_token)
-                
+            if twilio_client and TWILIO_WHATSAPP_TO:
                 support_message = f"""📩 *MENSAJE DE SOPORTE*
 
 👤 *Usuario:* {current_user.name}
@@ -2817,11 +3093,7 @@ ID Mensaje: {message_id}
 ---
 Responde a este mensaje para contactar al usuario."""
                 
-                twilio_client.messages.create(
-                    from_=whatsapp_from,
-                    body=support_message,
-                    to=whatsapp_to
-                )
+                await asyncio.to_thread(_send_team_whatsapp, support_message)
                 whatsapp_sent = True
                 
                 # Actualizar estado en DB
@@ -2923,7 +3195,6 @@ async def get_unread_count(current_user: User = Depends(get_current_user)):
 @api_router.post("/notifications/{notification_id}/read")
 async def mark_notification_read(notification_id: str, current_user: User = Depends(get_current_user)):
     """Mark notification as read"""
-    from bson import ObjectId
     await db.notifications.update_one(
         {"_id": ObjectId(notification_id), "user_id": current_user.user_id},
         {"$set": {"read": True}}
@@ -2968,58 +3239,25 @@ async def create_notification(user_id: str, title: str, message: str, notificati
 # =======================
 
 @api_router.get("/transactions")
-async def get_transactions(type: Optional[str] = None, current_user: User = Depends(get_current_user)):
+async def get_transactions(
+    response: Response,
+    type: Optional[str] = None,
+    current_user: User = Depends(get_current_user),
+    limit: int = Query(LIST_PAGE_MAX, ge=1, le=LIST_PAGE_MAX),
+    cursor: Optional[str] = None
+):
     """Get user transactions (optional filter by type: 'recharge' or 'withdrawal')"""
     query = {"user_id": current_user.user_id}
     if type:
         query["type"] = type
     
-    transactions = await db.transactions.find(query, {"_id": 0}).sort("created_at", -1).to_list(1000)
-    return [Transaction(**t) for t in transactions]
+    transactions = await fetch_page(db.transactions, query, TRANSACTION_LIST_PROJECTION, limit, cursor, response)
+    return page_json(Transaction, transactions, response)
 
 @api_router.get("/transactions/export")
 async def export_transactions(admin_user: User = Depends(get_admin_user)):
     """Admin: Export all transactions to Excel"""
-    transactions = await db.transactions.find({}, {"_id": 0}).to_list(10000)
-    
-    # Create workbook
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "Transactions"
-    
-    # Headers
-    headers = ["Transaction ID", "User ID", "Type", "Status", "Amount Input", "Amount Output", 
-               "Created At", "Completed At", "Beneficiary"]
-    ws.append(headers)
-    
-    # Data
-    for t in transactions:
-        beneficiary_name = ""
-        if t.get("beneficiary_data"):
-            beneficiary_name = t["beneficiary_data"].get("full_name", "")
-        
-        ws.append([
-            t.get("transaction_id", ""),
-            t.get("user_id", ""),
-            t.get("type", ""),
-            t.get("status", ""),
-            t.get("amount_input", 0),
-            t.get("amount_output", 0),
-            str(t.get("created_at", "")),
-            str(t.get("completed_at", "")),
-            beneficiary_name
-        ])
-    
-    # Save to bytes
-    output = BytesIO()
-    wb.save(output)
-    output.seek(0)
-    
-    return StreamingResponse(
-        output,
-        media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-        headers={"Content-Disposition": "attachment; filename=transactions.xlsx"}
-    )
+    return await transactions_export_response()
 
 # =======================
 # ADMIN RECORDS & MANUAL APPROVAL
@@ -3041,8 +3279,6 @@ async def get_admin_payment_records(admin_user: User = Depends(get_admin_user)):
 @api_router.get("/admin/payment-records/{record_id}")
 async def get_admin_payment_record_detail(record_id: str, admin_user: User = Depends(get_admin_user)):
     """Admin: Get a specific payment record with full details including proof image"""
-    from bson import ObjectId
-    
     record = await db.admin_payment_records.find_one({"_id": ObjectId(record_id)})
     
     if not record:
@@ -3059,10 +3295,11 @@ async def get_pending_recharges(admin_user: User = Depends(get_admin_user)):
         {"proof_image": 0}  # Exclude large base64 images from list view
     ).sort("created_at", -1).to_list(1000)
     
-    # Get user info for each recharge
+    # Get user info for all recharges in one query
+    users_map = await get_users_map(r.get("user_id") for r in recharges)
     result = []
     for r in recharges:
-        user = await db.users.find_one({"user_id": r.get("user_id")})
+        user = users_map.get(r.get("user_id"))
         r['_id'] = str(r['_id'])
         r['user_name'] = user.get('name', 'N/A') if user else 'N/A'
         r['user_email'] = user.get('email', 'N/A') if user else 'N/A'
@@ -3093,11 +3330,24 @@ class ApproveRechargeRequest(BaseModel):
 @api_router.post("/admin/recharge/approve")
 async def approve_recharge(request: ApproveRechargeRequest, admin_user: User = Depends(get_admin_user)):
     """Admin: Approve or reject a recharge with uploaded proof"""
+    now = datetime.now(timezone.utc)
     
-    transaction = await db.transactions.find_one({
-        "transaction_id": request.transaction_id,
-        "status": "pending_review"
-    })
+    pending_filter = {"transaction_id": request.transaction_id, "status": "pending_review"}
+    if request.approved:
+        # Claim and fetch the transaction in one call so a repeated approval can't credit twice
+        transaction = await db.transactions.find_one_and_update(
+            pending_filter,
+            {"$set": {
+                "status": "completed",
+                "completed_at": now,
+                "updated_at": now,
+                "approved_by": admin_user.user_id,
+                "verification_method": "admin_manual_approval"
+            }},
+            return_document=ReturnDocument.AFTER
+        )
+    else:
+        transaction = await db.transactions.find_one(pending_filter)
     
     if not transaction:
         raise HTTPException(status_code=404, detail="Transacción no encontrada o ya procesada")
@@ -3111,21 +3361,10 @@ async def approve_recharge(request: ApproveRechargeRequest, admin_user: User = D
             {"user_id": user_id},
             {"$inc": {"balance_ris": amount_ris}}
         )
-        
-        # Update transaction status
-        await db.transactions.update_one(
-            {"transaction_id": request.transaction_id},
-            {"$set": {
-                "status": "completed",
-                "completed_at": datetime.now(timezone.utc),
-                "updated_at": datetime.now(timezone.utc),
-                "approved_by": admin_user.user_id,
-                "verification_method": "admin_manual_approval"
-            }}
-        )
+        forget_cached_sessions(user_id)
         
         # Save admin record
-        user = await db.users.find_one({"user_id": user_id})
+        user = await db.users.find_one({"user_id": user_id}, {"_id": 0, "name": 1, "email": 1})
         admin_record = {
             "record_type": "recharge_approved",
             "transaction_id": request.transaction_id,
@@ -3139,8 +3378,8 @@ async def approve_recharge(request: ApproveRechargeRequest, admin_user: User = D
             "approved_by_email": admin_user.email,
             "processed_via": "admin_panel",
             "created_at": transaction.get("created_at"),
-            "completed_at": datetime.now(timezone.utc),
-            "recorded_at": datetime.now(timezone.utc)
+            "completed_at": now,
+            "recorded_at": now
         }
         
         await db.admin_payment_records.insert_one(admin_record)
@@ -3162,7 +3401,7 @@ async def approve_recharge(request: ApproveRechargeRequest, admin_user: User = D
             {"transaction_id": request.transaction_id},
             {"$set": {
                 "status": "rejected",
-                "updated_at": datetime.now(timezone.utc),
+                "updated_at": now,
                 "rejected_by": admin_user.user_id,
                 "rejection_reason": request.rejection_reason or "Comprobante inválido"
             }}
@@ -3184,9 +3423,41 @@ async def approve_recharge(request: ApproveRechargeRequest, admin_user: User = D
 # TWILIO WHATSAPP WEBHOOK
 # =======================
 
+# Admin phone -> (user_id, monotonic ts) of the last support thread it answered.
+# Admins usually reply to the same user several times in a row, so this skips
+# the "latest open support thread" query for follow-up messages. Cleared by
+# send_support_message whenever a new thread message arrives.
+ADMIN_TARGET_TTL_SECONDS = 120
+_admin_target_cache: dict[str, tuple[str, float]] = {}
+
+# Admin commands that close a support chat from WhatsApp
+CLOSE_COMMANDS = frozenset(['cerrar', '/cerrar', 'close', '/close', 'finalizar', '/finalizar', 'resolver', '/resolver'])
+_CLOSE_STRIP_RE = re.compile(r'(?<!\w)/?(?:cerrar|close|finalizar|resolver)\b', re.IGNORECASE)
+# Transaction / user references an admin may include in a WhatsApp message
+_TX_UUID_RE = re.compile(r'([a-f0-9]{8}-[a-f0-9]{4}-[a-f0-9]{4}-[a-f0-9]{4}-[a-f0-9]{12})', re.IGNORECASE)
+_TX_OBJECT_ID_RE = re.compile(r'ID[:\s]*([a-f0-9]{24})', re.IGNORECASE)
+_USER_TAG_RE = re.compile(r'user_([a-f0-9]+)', re.IGNORECASE)
+_USER_TAG_STRIP_RE = re.compile(r'user_[a-f0-9]+\s*')
+
+def _encode_data_uri(content_type: str, content: bytes) -> str:
+    """Build a base64 data URI (CPU-bound, run it off the event loop)"""
+    return f"data:{content_type};base64,{base64.b64encode(content).decode('ascii')}"
+
+def _get_cached_admin_target(phone: str) -> Optional[str]:
+    """Return the cached reply target for an admin phone if still fresh"""
+    entry = _admin_target_cache.get(phone)
+    if entry and time.monotonic() - entry[1] < ADMIN_TARGET_TTL_SECONDS:
+        return entry[0]
+    return None
+
 @api_router.post("/webhooks/twilio/whatsapp")
 async def twilio_whatsapp_webhook(request: Request):
-    """Webhook to receive WhatsApp messages from Twilio"""
+    """Webhook to receive WhatsApp messages from Twilio.
+    
+    Twilio ignores the body of inbound-message replies, so every path answers
+    with an empty 200 text response and reports its outcome through the logs.
+    """
+    now = datetime.now(timezone.utc)
     try:
         form_data = await request.form()
         
@@ -3196,10 +3467,10 @@ async def twilio_whatsapp_webhook(request: Request):
         num_media = int(form_data.get('NumMedia', 0))
         message_sid = form_data.get('MessageSid', '')
         
-        logger.info(f"=== WEBHOOK WHATSAPP RECIBIDO ===")
-        logger.info(f"From: {from_number}")
-        logger.info(f"Body: {body}")
-        logger.info(f"NumMedia: {num_media}")
+        logger.info("=== WEBHOOK WHATSAPP RECIBIDO ===")
+        logger.info("From: %s", from_number)
+        logger.info("Body: %s", body)
+        logger.info("NumMedia: %s", num_media)
         
         # Check if message has media (image)
         if num_media > 0:
@@ -3211,226 +3482,207 @@ async def twilio_whatsapp_webhook(request: Request):
             
             # Download the image
             if media_url and 'image' in media_content_type:
-                async with httpx.AsyncClient(follow_redirects=True) as client:
-                    # Twilio requires authentication to download media
-                    auth = (
-                        os.getenv('TWILIO_ACCOUNT_SID'),
-                        os.getenv('TWILIO_AUTH_TOKEN')
-                    )
-                    response = await client.get(media_url, auth=auth)
+                # Twilio requires authentication to download media
+                auth = (TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN)
+                # Media URLs redirect to the storage host; httpx drops the auth on that hop
+                response = await http_client.get(media_url, auth=auth, follow_redirects=True)
+                
+                logger.info(f"Media download status: {response.status_code}")
+                
+                if response.status_code == 200:
+                    # Convert to base64 in a worker thread so large images don't block other webhooks
+                    image_base64 = await asyncio.to_thread(_encode_data_uri, media_content_type, response.content)
                     
-                    logger.info(f"Media download status: {response.status_code}")
+                    logger.info("Imagen descargada y convertida a base64")
                     
-                    if response.status_code == 200:
-                        # Convert to base64
-                        import base64
-                        image_base64 = f"data:{media_content_type};base64,{base64.b64encode(response.content).decode()}"
+                    # Extract transaction ID from message body
+                    transaction_id = None
+                    if body:
+                        # Try to find transaction_id (UUID format) or MongoDB ObjectId
+                        uuid_match = _TX_UUID_RE.search(body)
+                        if uuid_match:
+                            # Search by transaction_id field
+                            tx = await db.transactions.find_one({"transaction_id": uuid_match.group(1), "status": "pending"})
+                            if tx:
+                                transaction_id = str(tx['_id'])
+                                logger.info(f"Transaction found by UUID: {transaction_id}")
                         
-                        logger.info("Imagen descargada y convertida a base64")
-                        
-                        # Extract transaction ID from message body
-                        transaction_id = None
-                        if body:
-                            import re
-                            # Try to find transaction_id (UUID format) or MongoDB ObjectId
-                            uuid_match = re.search(r'([a-f0-9]{8}-[a-f0-9]{4}-[a-f0-9]{4}-[a-f0-9]{4}-[a-f0-9]{12})', body, re.IGNORECASE)
-                            if uuid_match:
-                                # Search by transaction_id field
-                                tx = await db.transactions.find_one({"transaction_id": uuid_match.group(1), "status": "pending"})
-                                if tx:
-                                    transaction_id = str(tx['_id'])
-                                    logger.info(f"Transaction found by UUID: {transaction_id}")
-                            
-                            if not transaction_id:
-                                # Try ObjectId format
-                                oid_match = re.search(r'ID[:\s]*([a-f0-9]{24})', body, re.IGNORECASE)
-                                if oid_match:
-                                    transaction_id = oid_match.group(1)
-                                    logger.info(f"Transaction ID from ObjectId: {transaction_id}")
-                        
-                        # If no ID in current message, find the most recent pending transaction
                         if not transaction_id:
-                            logger.info("No ID encontrado en mensaje, buscando retiro pendiente más reciente...")
-                            recent_withdrawal = await db.transactions.find_one(
-                                {"type": "withdrawal", "status": "pending"},
-                                sort=[("created_at", -1)]
-                            )
-                            if recent_withdrawal:
-                                transaction_id = str(recent_withdrawal['_id'])
-                                logger.info(f"Retiro pendiente encontrado: {transaction_id}")
+                            # Try ObjectId format
+                            oid_match = _TX_OBJECT_ID_RE.search(body)
+                            if oid_match:
+                                transaction_id = oid_match.group(1)
+                                logger.info(f"Transaction ID from ObjectId: {transaction_id}")
+                    
+                    # If no ID in current message, find the most recent pending transaction
+                    if not transaction_id:
+                        logger.info("No ID encontrado en mensaje, buscando retiro pendiente más reciente...")
+                        recent_withdrawal = await db.transactions.find_one(
+                            {"type": "withdrawal", "status": "pending"},
+                            sort=[("created_at", -1)]
+                        )
+                        if recent_withdrawal:
+                            transaction_id = str(recent_withdrawal['_id'])
+                            logger.info(f"Retiro pendiente encontrado: {transaction_id}")
+                    
+                    if transaction_id:
+                        # Complete the withdrawal and get its data back in one call
+                        completed_tx = await db.transactions.find_one_and_update(
+                            {"_id": ObjectId(transaction_id), "status": "pending"},
+                            {"$set": {
+                                "status": "completed",
+                                "proof_image": image_base64,
+                                "completed_at": now,
+                                "updated_at": now,
+                                "processed_via": "whatsapp"
+                            }},
+                            projection={"proof_image": 0},
+                            return_document=ReturnDocument.AFTER
+                        )
                         
-                        if transaction_id:
-                            from bson import ObjectId
-                            
-                            # Get transaction before update to have all data
-                            tx_before = await db.transactions.find_one({"_id": ObjectId(transaction_id)})
-                            
+                        if not completed_tx:
+                            tx_before = await db.transactions.find_one({"_id": ObjectId(transaction_id)}, {"_id": 0, "transaction_id": 1})
                             if not tx_before:
                                 logger.error(f"Transacción no encontrada: {transaction_id}")
-                                return {"status": "error", "message": "Transaction not found"}
-                            
-                            if tx_before.get('status') != 'pending':
-                                logger.warning(f"Transacción ya procesada: {transaction_id}")
-                                # Still send confirmation
-                                from twilio.rest import Client
-                                twilio_client = Client(os.getenv('TWILIO_ACCOUNT_SID'), os.getenv('TWILIO_AUTH_TOKEN'))
-                                twilio_client.messages.create(
-                                    from_=os.getenv('TWILIO_WHATSAPP_FROM'),
-                                    body=f"⚠️ Esta transacción ya fue procesada anteriormente.\nID: {tx_before.get('transaction_id', transaction_id)}",
-                                    to=from_number
-                                )
-                                return {"status": "already_processed"}
+                                return PlainTextResponse("")
                             
-                            # Update transaction
-                            result = await db.transactions.update_one(
-                                {"_id": ObjectId(transaction_id), "status": "pending"},
-                                {"$set": {
-                                    "status": "completed",
-                                    "proof_image": image_base64,
-                                    "completed_at": datetime.now(timezone.utc),
-                                    "updated_at": datetime.now(timezone.utc),
-                                    "processed_via": "whatsapp"
-                                }}
-                            )
-                            
-                            logger.info(f"Update result: modified_count={result.modified_count}")
-                            
-                            if result.modified_count > 0:
-                                # Get full transaction data
-                                completed_tx = await db.transactions.find_one({"_id": ObjectId(transaction_id)})
-                                user_id = completed_tx.get('user_id')
-                                tx_id = completed_tx.get('transaction_id', transaction_id)
-                                
-                                # Get user info
-                                user = await db.users.find_one({"user_id": user_id})
-                                
-                                beneficiary = completed_tx.get('beneficiary_data', {})
-                                amount_ris = completed_tx.get('amount_input', 0)
-                                amount_ves = completed_tx.get('amount_output', 0)
-                                
-                                logger.info(f"Transacción completada: {tx_id}")
-                                logger.info(f"Usuario: {user_id}, Monto: {amount_ris} RIS -> {amount_ves} VES")
-                                
-                                # ============================
-                                # SAVE ADMIN RECORD
-                                # ============================
-                                admin_record = {
-                                    "record_type": "withdrawal_completed",
+                            logger.warning(f"Transacción ya procesada: {transaction_id}")
+                            # Still send confirmation
+                            spawn_background(_safe_whatsapp_notify(f"⚠️ Esta transacción ya fue procesada anteriormente.\nID: {tx_before.get('transaction_id', transaction_id)}", to=from_number))
+                            return PlainTextResponse("")
+                        
+                        user_id = completed_tx.get('user_id')
+                        tx_id = completed_tx.get('transaction_id', transaction_id)
+                        
+                        # Get user info
+                        user = await db.users.find_one(
+                            {"user_id": user_id}, {"_id": 0, "name": 1, "email": 1, "fcm_token": 1}
+                        )
+                        
+                        beneficiary = completed_tx.get('beneficiary_data') or {}
+                        b_name = beneficiary.get('full_name', 'N/A')
+                        b_bank = beneficiary.get('bank', 'N/A')
+                        b_code = beneficiary.get('bank_code', 'N/A')
+                        b_acct = beneficiary.get('account_number', 'N/A')
+                        b_id = beneficiary.get('id_document', 'N/A')
+                        b_phone = beneficiary.get('phone_number', 'N/A')
+                        amount_ris = completed_tx.get('amount_input', 0)
+                        amount_ves = completed_tx.get('amount_output', 0)
+                        
+                        logger.info(f"Transacción completada: {tx_id}")
+                        logger.info(f"Usuario: {user_id}, Monto: {amount_ris} RIS -> {amount_ves} VES")
+                        
+                        # ============================
+                        # SAVE ADMIN RECORD
+                        # ============================
+                        base_fields = {
+                            "transaction_id": tx_id,
+                            "mongo_id": transaction_id,
+                            "user_id": user_id,
+                            "amount_ris": amount_ris,
+                            "amount_ves": amount_ves,
+                            "processed_via": "whatsapp",
+                            "created_at": completed_tx.get('created_at'),
+                            "completed_at": now
+                        }
+                        admin_record = {
+                            **base_fields,
+                            "record_type": "withdrawal_completed",
+                            "user_name": user.get('name', 'N/A') if user else 'N/A',
+                            "user_email": user.get('email', 'N/A') if user else 'N/A',
+                            "beneficiary": {
+                                "full_name": b_name,
+                                "bank": b_bank,
+                                "bank_code": b_code,
+                                "account_number": b_acct,
+                                "id_document": b_id,
+                                "phone_number": b_phone
+                            },
+                            "proof_image": image_base64,
+                            "processed_by_phone": from_number,
+                            "whatsapp_message_sid": message_sid,
+                            "recorded_at": now
+                        }
+                        
+                        # ============================
+                        # SAVE RECORD + NOTIFY USER (in parallel)
+                        # ============================
+                        side_effects = {
+                            "Registro admin": db.admin_payment_records.insert_one(admin_record),
+                            "Notificación in-app": create_notification(
+                                user_id=user_id,
+                                title="✅ Retiro Completado",
+                                message=f"Tu retiro de {amount_ris:.2f} RIS ({amount_ves:.2f} VES) a {beneficiary.get('full_name', 'beneficiario')} fue procesado exitosamente. ID: {tx_id[:8]}...",
+                                notification_type="withdrawal_completed",
+                                data={
                                     "transaction_id": tx_id,
-                                    "mongo_id": transaction_id,
-                                    "user_id": user_id,
-                                    "user_name": user.get('name', 'N/A') if user else 'N/A',
-                                    "user_email": user.get('email', 'N/A') if user else 'N/A',
                                     "amount_ris": amount_ris,
-                                    "amount_ves": amount_ves,
-                                    "beneficiary": {
-                                        "full_name": beneficiary.get('full_name', 'N/A'),
-                                        "bank": beneficiary.get('bank', 'N/A'),
-                                        "bank_code": beneficiary.get('bank_code', 'N/A'),
-                                        "account_number": beneficiary.get('account_number', 'N/A'),
-                                        "id_document": beneficiary.get('id_document', 'N/A'),
-                                        "phone_number": beneficiary.get('phone_number', 'N/A')
-                                    },
-                                    "proof_image": image_base64,
-                                    "processed_via": "whatsapp",
-                                    "processed_by_phone": from_number,
-                                    "whatsapp_message_sid": message_sid,
-                                    "created_at": completed_tx.get('created_at'),
-                                    "completed_at": datetime.now(timezone.utc),
-                                    "recorded_at": datetime.now(timezone.utc)
+                                    "amount_ves": amount_ves
                                 }
-                                
-                                await db.admin_payment_records.insert_one(admin_record)
-                                logger.info(f"Registro admin guardado para TX: {tx_id}")
-                                
-                                # ============================
-                                # CREATE IN-APP NOTIFICATION
-                                # ============================
-                                await create_notification(
-                                    user_id=user_id,
-                                    title="✅ Retiro Completado",
-                                    message=f"Tu retiro de {amount_ris:.2f} RIS ({amount_ves:.2f} VES) a {beneficiary.get('full_name', 'beneficiario')} fue procesado exitosamente. ID: {tx_id[:8]}...",
-                                    notification_type="withdrawal_completed",
-                                    data={
-                                        "transaction_id": tx_id,
-                                        "amount_ris": amount_ris,
-                                        "amount_ves": amount_ves
-                                    }
-                                )
-                                logger.info(f"Notificación in-app creada para usuario {user_id}")
-                                
-                                # Try push notification
-                                if user and user.get('fcm_token'):
-                                    try:
-                                        from push_service import push_service
-                                        await push_service.send_withdrawal_completed_notification(
-                                            push_token=user['fcm_token'],
-                                            transaction_id=tx_id,
-                                            amount_ris=amount_ris,
-                                            amount_ves=amount_ves,
-                                            beneficiary_name=beneficiary.get('full_name', 'Beneficiario')
-                                        )
-                                        logger.info("Push notification enviada")
-                                    except Exception as e:
-                                        logger.warning(f"Push notification falló: {e}")
-                                
-                                # ============================
-                                # SEND WHATSAPP CONFIRMATION TO ADMIN
-                                # ============================
-                                from twilio.rest import Client
-                                twilio_client = Client(
-                                    os.getenv('TWILIO_ACCOUNT_SID'),
-                                    os.getenv('TWILIO_AUTH_TOKEN')
+                            ),
+                        }
+                        
+                        # Push is bounded so a stalled upstream can't eat Twilio's webhook budget
+                        if user and user.get('fcm_token'):
+                            try:
+                                from push_service import push_service
+                                side_effects["Push notification"] = asyncio.wait_for(
+                                    push_service.send_withdrawal_completed_notification(
+                                        push_token=user['fcm_token'],
+                                        transaction_id=tx_id,
+                                        amount_ris=amount_ris,
+                                        amount_ves=amount_ves,
+                                        beneficiary_name=beneficiary.get('full_name', 'Beneficiario')
+                                    ),
+                                    timeout=PUSH_TIMEOUT_SECONDS
                                 )
-                                
-                                confirmation_msg = f"""✅ *RETIRO PROCESADO EXITOSAMENTE*
+                            except Exception as e:
+                                logger.warning(f"Push notification falló: {e}")
+                        
+                        results = await asyncio.gather(*side_effects.values(), return_exceptions=True)
+                        for label, outcome in zip(side_effects, results):
+                            if isinstance(outcome, BaseException):
+                                logger.warning(f"{label} falló para TX {tx_id}: {outcome!r}")
+                            else:
+                                logger.info(f"{label} OK para TX {tx_id}")
+                        
+                        # ============================
+                        # SEND WHATSAPP CONFIRMATION TO ADMIN
+                        # ============================
+                        confirmation_msg = f"""✅ *RETIRO PROCESADO EXITOSAMENTE*
 
 📋 *Detalles:*
 🔢 ID: {tx_id}
 💰 Monto: {amount_ris:.2f} RIS → {amount_ves:.2f} VES
-👤 Beneficiario: {beneficiary.get('full_name', 'N/A')}
-🏦 Banco: {beneficiary.get('bank_code', '')} {beneficiary.get('bank', 'N/A')}
+👤 Beneficiario: {b_name}
+🏦 Banco: {beneficiary.get('bank_code', '')} {b_bank}
 
 ✅ Usuario notificado
 ✅ Registro guardado
 ✅ Historial actualizado"""
-                                
-                                twilio_client.messages.create(
-                                    from_=os.getenv('TWILIO_WHATSAPP_FROM'),
-                                    body=confirmation_msg,
-                                    to=from_number
-                                )
-                                logger.info("Confirmación WhatsApp enviada al admin")
-                                
-                                return {"status": "success", "transaction_id": tx_id}
-                            else:
-                                logger.warning(f"No se pudo actualizar transacción: {transaction_id}")
-                        else:
-                            logger.warning("No se encontró ninguna transacción pendiente")
-                            # Notify admin
-                            from twilio.rest import Client
-                            twilio_client = Client(os.getenv('TWILIO_ACCOUNT_SID'), os.getenv('TWILIO_AUTH_TOKEN'))
-                            twilio_client.messages.create(
-                                from_=os.getenv('TWILIO_WHATSAPP_FROM'),
-                                body="⚠️ No se encontró ninguna transacción pendiente para procesar.",
-                                to=from_number
-                            )
+                        
+                        spawn_background(_safe_whatsapp_notify(confirmation_msg, to=from_number))
+                        logger.info("Confirmación WhatsApp encolada para el admin")
+                        
+                        return PlainTextResponse("")
                     else:
-                        logger.error(f"Error descargando imagen: {response.status_code}")
+                        logger.warning("No se encontró ninguna transacción pendiente")
+                        # Notify admin
+                        spawn_background(_safe_whatsapp_notify("⚠️ No se encontró ninguna transacción pendiente para procesar.", to=from_number))
+                else:
+                    logger.error(f"Error descargando imagen: {response.status_code}")
         else:
             # Message without image - could be a support response or command
             logger.info("Mensaje sin imagen - verificando si es respuesta de soporte o comando")
             
             if body and body.strip():
-                import re
                 body_lower = body.strip().lower()
                 
                 # Check for close/end chat commands
-                close_commands = ['cerrar', '/cerrar', 'close', '/close', 'finalizar', '/finalizar', 'resolver', '/resolver']
-                is_close_command = any(cmd in body_lower for cmd in close_commands)
+                is_close_command = any(cmd in body_lower for cmd in CLOSE_COMMANDS)
                 
                 # Look for user_id pattern in the message (user_XXXX)
-                user_match = re.search(r'user_([a-f0-9]+)', body, re.IGNORECASE)
+                user_match = _USER_TAG_RE.search(body)
                 
                 target_user_id = None
                 response_message = body.strip()
@@ -3439,18 +3691,25 @@ async def twilio_whatsapp_webhook(request: Request):
                     # Admin included user ID in message
                     target_user_id = f"user_{user_match.group(1)}"
                     # Remove the user ID from the message to get clean response
-                    response_message = re.sub(r'user_[a-f0-9]+\s*', '', body).strip()
+                    response_message = _USER_TAG_STRIP_RE.sub('', body).strip()
                     logger.info(f"User ID encontrado en mensaje: {target_user_id}")
                 else:
+                    target_user_id = _get_cached_admin_target(from_number)
+                    if target_user_id:
+                        logger.info(f"Respondiendo al destinatario reciente en caché: {target_user_id}")
+                
+                if not target_user_id:
                     # Find the most recent open support conversation
                     recent_support = await db.support_messages.find_one(
-                        {"status": {"$ne": "closed"}},
+                        {"status": {"$in": OPEN_SUPPORT_STATUSES}},
+                        {"user_id": 1, "_id": 0},
                         sort=[("created_at", -1)]
                     )
                     if not recent_support:
                         # Fallback to any recent support message
                         recent_support = await db.support_messages.find_one(
                             {},
+                            {"user_id": 1, "_id": 0},
                             sort=[("created_at", -1)]
                         )
                     if recent_support:
@@ -3458,25 +3717,25 @@ async def twilio_whatsapp_webhook(request: Request):
                         logger.info(f"Respondiendo al último mensaje de soporte de: {target_user_id}")
                 
                 if target_user_id:
+                    _admin_target_cache[from_number] = (target_user_id, time.monotonic())
+                    
                     # Get user info
-                    user = await db.users.find_one({"user_id": target_user_id})
+                    user = await db.users.find_one({"user_id": target_user_id}, {"_id": 0, "name": 1})
                     
                     if user:
-                        from twilio.rest import Client
-                        twilio_client = Client(os.getenv('TWILIO_ACCOUNT_SID'), os.getenv('TWILIO_AUTH_TOKEN'))
-                        
                         if is_close_command:
+                            # Conversation is over; next reply must re-resolve its target
+                            _admin_target_cache.pop(from_number, None)
+                            
                             # Close the support conversation
                             # Mark all messages from this user as closed
                             await db.support_messages.update_many(
                                 {"user_id": target_user_id},
-                                {"$set": {"status": "closed", "closed_at": datetime.now(timezone.utc)}}
+                                {"$set": {"status": "closed", "closed_at": now}}
                             )
                             
                             # Get optional closing message (text after the command)
-                            closing_message = response_message
-                            for cmd in close_commands:
-                                closing_message = closing_message.replace(cmd, '').strip()
+                            closing_message = _CLOSE_STRIP_RE.sub('', response_message).strip()
                             
                             if not closing_message:
                                 closing_message = "Tu caso de soporte ha sido resuelto. ¡Gracias por contactarnos!"
@@ -3488,7 +3747,7 @@ async def twilio_whatsapp_webhook(request: Request):
                                 "sender": "admin",
                                 "type": "close",
                                 "from_phone": from_number,
-                                "created_at": datetime.now(timezone.utc)
+                                "created_at": now
                             }
                             await db.support_responses.insert_one(admin_response)
                             
@@ -3504,11 +3763,7 @@ async def twilio_whatsapp_webhook(request: Request):
                             logger.info(f"Chat de soporte cerrado para {target_user_id}")
                             
                             # Confirm to admin
-                            twilio_client.messages.create(
-                                from_=os.getenv('TWILIO_WHATSAPP_FROM'),
-                                body=f"✅ Chat cerrado con {user.get('name', target_user_id)}.\nEl usuario ha sido notificado.",
-                                to=from_number
-                            )
+                            spawn_background(_safe_whatsapp_notify(f"✅ Chat cerrado con {user.get('name', target_user_id)}.\nEl usuario ha sido notificado.", to=from_number))
                         else:
                             # Regular response (not a close command)
                             # Save the admin response
@@ -3517,7 +3772,7 @@ async def twilio_whatsapp_webhook(request: Request):
                                 "message": response_message,
                                 "sender": "admin",
                                 "from_phone": from_number,
-                                "created_at": datetime.now(timezone.utc)
+                                "created_at": now
                             }
                             await db.support_responses.insert_one(admin_response)
                             
@@ -3533,66 +3788,109 @@ async def twilio_whatsapp_webhook(request: Request):
                             logger.info(f"Respuesta de soporte enviada a {target_user_id}")
                             
                             # Confirm to admin with available commands
-                            twilio_client.messages.create(
-                                from_=os.getenv('TWILIO_WHATSAPP_FROM'),
-                                body=f"✅ Respuesta enviada a {user.get('name', target_user_id)}\n\n💡 Comandos: cerrar, finalizar, resolver",
-                                to=from_number
-                            )
+                            spawn_background(_safe_whatsapp_notify(f"✅ Respuesta enviada a {user.get('name', target_user_id)}\n\n💡 Comandos: cerrar, finalizar, resolver", to=from_number))
                     else:
                         logger.warning(f"Usuario no encontrado: {target_user_id}")
-                        from twilio.rest import Client
-                        twilio_client = Client(os.getenv('TWILIO_ACCOUNT_SID'), os.getenv('TWILIO_AUTH_TOKEN'))
-                        twilio_client.messages.create(
-                            from_=os.getenv('TWILIO_WHATSAPP_FROM'),
-                            body=f"⚠️ Usuario {target_user_id} no encontrado",
-                            to=from_number
-                        )
+                        spawn_background(_safe_whatsapp_notify(f"⚠️ Usuario {target_user_id} no encontrado", to=from_number))
                 else:
                     logger.info("No se pudo determinar el destinatario de la respuesta")
         
-        return {"status": "success"}
+        return PlainTextResponse("")
         
     except Exception as e:
         logger.error(f"WhatsApp webhook error: {e}")
-        import traceback
         logger.error(traceback.format_exc())
-        return {"status": "error", "message": str(e)}
+        return PlainTextResponse("")
 
 # =======================
 # ADMIN PANEL - COMPLETE ENDPOINTS
 # =======================
 
 # --- Dashboard ---
+# Counters are cheap, the volume aggregate is not: each half is cached on its own
+DASHBOARD_CACHE_TTL_SECONDS = 30
+_dashboard_cache = {part: {"ts": 0.0, "data": None} for part in ("fast", "volume")}
+_dashboard_locks = {part: asyncio.Lock() for part in _dashboard_cache}
+
+def invalidate_dashboard_cache():
+    """Force the next dashboard request to recompute its statistics"""
+    for entry in _dashboard_cache.values():
+        entry["ts"] = 0.0
+
+async def _get_dashboard_part(part: str, compute):
+    """Serve a dashboard section from cache, recomputing it once when stale"""
+    entry = _dashboard_cache[part]
+    if time.monotonic() - entry["ts"] < DASHBOARD_CACHE_TTL_SECONDS:
+        return entry["data"]
+    
+    async with _dashboard_locks[part]:
+        # Another admin may have refreshed the cache while we waited
+        if time.monotonic() - entry["ts"] < DASHBOARD_CACHE_TTL_SECONDS:
+            return entry["data"]
+        
+        data = await compute()
+        entry["data"] = data
+        entry["ts"] = time.monotonic()
+        return data
+
 @api_router.get("/admin/dashboard")
 async def get_admin_dashboard(admin_user: User = Depends(get_admin_user)):
     """Get dashboard statistics"""
     if not has_permission(admin_user, "dashboard.view"):
         raise HTTPException(status_code=403, detail="Permission denied")
     
-    # Get statistics
-    total_users = await db.users.count_documents({"role": {"$ne": "admin"}})
-    verified_users = await db.users.count_documents({"verification_status": "verified"})
-    pending_kyc = await db.users.count_documents({"verification_status": "pending", "id_document_image": {"$ne": None}})
-    
-    total_transactions = await db.transactions.count_documents({})
-    pending_withdrawals = await db.transactions.count_documents({"type": "withdrawal", "status": "pending"})
-    pending_recharges = await db.transactions.count_documents({"type": "recharge", "status": "pending_review"})
-    pending_ves_recharges = await db.transactions.count_documents({"type": "recharge_ves", "status": "pending_manual_approval"})
-    completed_transactions = await db.transactions.count_documents({"status": "completed"})
-    
-    open_support = await db.support_messages.count_documents({"status": {"$ne": "closed"}})
+    counts, volume = await asyncio.gather(
+        _get_dashboard_part("fast", _compute_dashboard_counts),
+        _get_dashboard_part("volume", _compute_dashboard_volume)
+    )
+    return {**counts, "volume": volume}
+
+@api_router.get("/admin/dashboard/fast")
+async def get_admin_dashboard_fast(admin_user: User = Depends(get_admin_user)):
+    """Get dashboard counters and rate (render first, volume loads separately)"""
+    if not has_permission(admin_user, "dashboard.view"):
+        raise HTTPException(status_code=403, detail="Permission denied")
     
-    # Volume calculations
-    pipeline = [
-        {"$match": {"status": "completed"}},
-        {"$group": {"_id": "$type", "total": {"$sum": "$amount_input"}}}
-    ]
-    volumes = await db.transactions.aggregate(pipeline).to_list(10)
-    volume_by_type = {v["_id"]: v["total"] for v in volumes}
+    return await _get_dashboard_part("fast", _compute_dashboard_counts)
+
+@api_router.get("/admin/dashboard/volume")
+async def get_admin_dashboard_volume(admin_user: User = Depends(get_admin_user)):
+    """Get completed volume by type (slow half of the dashboard)"""
+    if not has_permission(admin_user, "dashboard.view"):
+        raise HTTPException(status_code=403, detail="Permission denied")
     
-    # Get rate
-    rate = await db.settings.find_one({"key": "exchange_rate"})
-    current_rate = rate.get("ris_to_ves", 78) if rate else 78
+    return {"volume": await _get_dashboard_part("volume", _compute_dashboard_volume)}
+
+async def _compute_dashboard_counts():
+    """Run the dashboard counter queries"""
+    # All queries are independent, run them concurrently
+    (
+        all_users,
+        admin_users,
+        verified_users,
+        pending_kyc,
+        total_transactions,
+        pending_withdrawals,
+        pending_recharges,
+        pending_ves_recharges,
+        completed_transactions,
+        open_support,
+        current_rate,
+    ) = await asyncio.gather(
+        # Unfiltered totals come from collection metadata; admins are few
+        db.users.estimated_document_count(),
+        db.users.count_documents({"role": "admin"}),
+        db.users.count_documents({"verification_status": "verified"}),
+        db.users.count_documents({"verification_status": "pending", "id_document_image": {"$ne": None}}),
+        db.transactions.estimated_document_count(),
+        db.transactions.count_documents({"type": "withdrawal", "status": "pending"}),
+        db.transactions.count_documents({"type": "recharge", "status": "pending_review"}),
+        db.transactions.count_documents({"type": "recharge_ves", "status": "pending_manual_approval"}),
+        db.transactions.count_documents({"status": "completed"}),
+        db.support_messages.count_documents({"status": {"$in": OPEN_SUPPORT_STATUSES}}),
+        get_cached_rate(),
+    )
+    total_users = max(all_users - admin_users, 0)
     
     return {
         "users": {
@@ -3610,13 +3908,23 @@ async def get_admin_dashboard(admin_user: User = Depends(get_admin_user)):
         "support": {
             "open_chats": open_support
         },
-        "volume": {
-            "withdrawals": volume_by_type.get("withdrawal", 0),
-            "recharges": volume_by_type.get("recharge", 0)
-        },
         "current_rate": current_rate
     }
 
+async def _compute_dashboard_volume():
+    """Run the completed volume aggregation"""
+    pipeline = [
+        {"$match": {"status": "completed"}},
+        {"$group": {"_id": "$type", "total": {"$sum": "$amount_input"}}}
+    ]
+    volumes = await db.transactions.aggregate(pipeline).to_list(10)
+    volume_by_type = {v["_id"]: v["total"] for v in volumes}
+    
+    return {
+        "withdrawals": volume_by_type.get("withdrawal", 0),
+        "recharges": volume_by_type.get("recharge", 0)
+    }
+
 # --- Sub-Admin Management ---
 class CreateSubAdminRequest(BaseModel):
     email: str
@@ -3628,17 +3936,20 @@ class UpdateSubAdminRequest(BaseModel):
     is_active: Optional[bool] = None
     name: Optional[str] = None
 
+# ADMIN_PERMISSIONS never changes at runtime, serialize it once
+_PERMISSIONS_LIST_JSON = orjson.dumps(ADMIN_PERMISSIONS)
+
 @api_router.get("/admin/permissions-list")
 async def get_permissions_list(admin_user: User = Depends(get_admin_user)):
     """Get list of all available permissions"""
-    return ADMIN_PERMISSIONS
+    return Response(content=_PERMISSIONS_LIST_JSON, media_type="application/json")
 
 @api_router.get("/admin/sub-admins")
 async def get_sub_admins(admin_user: User = Depends(get_super_admin)):
     """Get all sub-administrators (super_admin only)"""
     admins = await db.users.find(
-        {"role": {"$in": ["admin", "super_admin"]}},
-        {"id_document_image": 0, "cpf_image": 0, "selfie_image": 0}
+        {"role": ADMIN_ROLE_FILTER},
+        NO_KYC_IMAGES_PROJECTION
     ).to_list(100)
     
     for a in admins:
@@ -3649,6 +3960,7 @@ async def get_sub_admins(admin_user: User = Depends(get_super_admin)):
 @api_router.post("/admin/sub-admins")
 async def create_sub_admin(request: CreateSubAdminRequest, admin_user: User = Depends(get_super_admin)):
     """Create a new sub-administrator (super_admin only)"""
+    now = datetime.now(timezone.utc)
     
     # Check if user already exists
     existing = await db.users.find_one({"email": request.email})
@@ -3661,9 +3973,10 @@ async def create_sub_admin(request: CreateSubAdminRequest, admin_user: User = De
                 "role": "admin",
                 "permissions": request.permissions,
                 "created_by_admin": admin_user.user_id,
-                "updated_at": datetime.now(timezone.utc)
+                "updated_at": now
             }}
         )
+        forget_cached_sessions(existing["user_id"])
         return {"message": f"Usuario {request.email} promovido a admin", "user_id": existing.get('user_id')}
     else:
         # Create new admin user
@@ -3677,7 +3990,7 @@ async def create_sub_admin(request: CreateSubAdminRequest, admin_user: User = De
             "balance_ris": 0,
             "verification_status": "verified",  # Admins don't need KYC
             "created_by_admin": admin_user.user_id,
-            "created_at": datetime.now(timezone.utc)
+            "created_at": now
         }
         await db.users.insert_one(new_admin)
         return {"message": f"Admin {request.email} creado", "user_id": new_admin['user_id']}
@@ -3686,7 +3999,7 @@ async def create_sub_admin(request: CreateSubAdminRequest, admin_user: User = De
 async def update_sub_admin(user_id: str, request: UpdateSubAdminRequest, admin_user: User = Depends(get_super_admin)):
     """Update a sub-administrator (super_admin only)"""
     
-    target = await db.users.find_one({"user_id": user_id})
+    target = await db.users.find_one({"user_id": user_id}, {"_id": 0, "role": 1})
     if not target:
         raise HTTPException(status_code=404, detail="Admin no encontrado")
     
@@ -3702,13 +4015,14 @@ async def update_sub_admin(user_id: str, request: UpdateSubAdminRequest, admin_u
         update_data["name"] = request.name
     
     await db.users.update_one({"user_id": user_id}, {"$set": update_data})
+    forget_cached_sessions(user_id)
     return {"message": "Admin actualizado"}
 
 @api_router.delete("/admin/sub-admins/{user_id}")
 async def delete_sub_admin(user_id: str, admin_user: User = Depends(get_super_admin)):
     """Remove admin role from user (super_admin only)"""
     
-    target = await db.users.find_one({"user_id": user_id})
+    target = await db.users.find_one({"user_id": user_id}, {"_id": 0, "role": 1})
     if not target:
         raise HTTPException(status_code=404, detail="Admin no encontrado")
     
@@ -3719,8 +4033,62 @@ async def delete_sub_admin(user_id: str, admin_user: User = Depends(get_super_ad
         {"user_id": user_id},
         {"$set": {"role": "user", "permissions": []}}
     )
+    forget_cached_sessions(user_id)
     return {"message": "Rol de admin removido"}
 
+# --- Keyset pagination ---
+PAGE_SORT = [("created_at", -1), ("_id", -1)]
+
+def encode_page_cursor(doc: dict) -> Optional[str]:
+    """Build an opaque cursor pointing after the given document"""
+    if not doc.get("created_at"):
+        return None
+    raw = f"{doc['created_at'].isoformat()}|{doc['_id']}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+def apply_page_cursor(query: dict, cursor: str) -> dict:
+    """Restrict query to documents that sort after the cursor"""
+    try:
+        ts_str, oid_str = base64.urlsafe_b64decode(cursor.encode()).decode().split("|", 1)
+        ts = datetime.fromisoformat(ts_str)
+        oid = ObjectId(oid_str)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Cursor inválido")
+    
+    page_filter = {"$or": [
+        {"created_at": {"$lt": ts}},
+        {"created_at": ts, "_id": {"$lt": oid}}
+    ]}
+    if "$or" in query:
+        return {"$and": [query, page_filter]}
+    return {**query, **page_filter}
+
+async def fetch_page(collection, query: dict, projection: Optional[dict], limit: int,
+                     cursor: Optional[str], response: Response) -> list:
+    """Fetch one newest-first page and expose the next cursor as X-Next-Cursor"""
+    page_query = apply_page_cursor(query, cursor) if cursor else query
+    docs = await collection.find(page_query, projection).sort(PAGE_SORT).limit(limit).to_list(limit)
+    if len(docs) == limit:
+        next_cursor = encode_page_cursor(docs[-1])
+        if next_cursor:
+            response.headers["X-Next-Cursor"] = next_cursor
+    return docs
+
+def page_json(model, docs: list, response: Response) -> ORJSONResponse:
+    """Render a fetched page through the model's fields straight to orjson, skipping jsonable_encoder"""
+    return ORJSONResponse(
+        [model.model_construct(**doc).model_dump() for doc in docs],
+        headers=dict(response.headers)
+    )
+
+async def get_users_map(user_ids, fields=("name", "email")) -> dict:
+    """Fetch a few fields (name/email by default) for many users in one query, keyed by user_id"""
+    users = await db.users.find(
+        {"user_id": {"$in": list(set(user_ids))}},
+        {"_id": 0, "user_id": 1, **{field: 1 for field in fields}}
+    ).to_list(None)
+    return {u["user_id"]: u for u in users}
+
 # --- Users Management ---
 @api_router.get("/admin/users")
 async def get_all_users(
@@ -3728,32 +4096,46 @@ async def get_all_users(
     skip: int = 0,
     limit: int = 50,
     search: Optional[str] = None,
-    status: Optional[str] = None
+    status: Optional[str] = None,
+    cursor: Optional[str] = None
 ):
-    """Get all users with pagination"""
+    """Get all users with pagination (pass next_cursor back as cursor for deep pages)"""
     if not has_permission(admin_user, "users.view"):
         raise HTTPException(status_code=403, detail="Permission denied")
     
-    query = {"role": {"$in": ["user", None]}}
-    if search:
+    query = {"role": USER_ROLE_FILTER}
+    if search and "@" in search:
+        # Full email typed: exact match on the unique email index (stored lowercase)
+        query["email"] = search.lower().strip()
+    elif search:
+        term = re.escape(search.strip())
         query["$or"] = [
-            {"name": {"$regex": search, "$options": "i"}},
-            {"email": {"$regex": search, "$options": "i"}}
+            # Case-insensitive substring (surnames too); this scans the name index
+            {"name": {"$regex": term, "$options": "i"}},
+            # Emails are stored lowercase, so a case-sensitive prefix gets tight
+            # bounds on the email index
+            {"email": {"$regex": f"^{term.lower()}"}}
         ]
     if status:
         query["verification_status"] = status
     
-    users = await db.users.find(
-        query,
-        {"id_document_image": 0, "cpf_image": 0, "selfie_image": 0}
-    ).skip(skip).limit(limit).sort("created_at", -1).to_list(limit)
+    page_query = apply_page_cursor(query, cursor) if cursor else query
+    users_cursor = db.users.find(
+        page_query,
+        NO_KYC_IMAGES_PROJECTION
+    ).sort(PAGE_SORT)
+    if not cursor:
+        # Legacy offset pagination for the first pages
+        users_cursor = users_cursor.skip(skip)
+    users = await users_cursor.limit(limit).to_list(limit)
     
     total = await db.users.count_documents(query)
     
+    next_cursor = encode_page_cursor(users[-1]) if len(users) == limit else None
     for u in users:
         u['_id'] = str(u['_id'])
     
-    return {"users": users, "total": total}
+    return {"users": users, "total": total, "next_cursor": next_cursor}
 
 @api_router.get("/admin/users/{user_id}")
 async def get_user_detail(user_id: str, admin_user: User = Depends(get_admin_user)):
@@ -3761,19 +4143,20 @@ async def get_user_detail(user_id: str, admin_user: User = Depends(get_admin_use
     if not has_permission(admin_user, "users.view"):
         raise HTTPException(status_code=403, detail="Permission denied")
     
-    user = await db.users.find_one({"user_id": user_id})
+    # User and transaction history summary are fetched concurrently
+    user, tx_count, tx_volume = await asyncio.gather(
+        db.users.find_one({"user_id": user_id}),
+        db.transactions.count_documents({"user_id": user_id}),
+        db.transactions.aggregate([
+            {"$match": {"user_id": user_id, "status": "completed"}},
+            {"$group": {"_id": None, "total": {"$sum": "$amount_input"}}}
+        ]).to_list(1)
+    )
     if not user:
         raise HTTPException(status_code=404, detail="Usuario no encontrado")
     
     user['_id'] = str(user['_id'])
     
-    # Get user's transaction history summary
-    tx_count = await db.transactions.count_documents({"user_id": user_id})
-    tx_volume = await db.transactions.aggregate([
-        {"$match": {"user_id": user_id, "status": "completed"}},
-        {"$group": {"_id": None, "total": {"$sum": "$amount_input"}}}
-    ]).to_list(1)
-    
     user['transaction_count'] = tx_count
     user['transaction_volume'] = tx_volume[0]['total'] if tx_volume else 0
     
@@ -3794,60 +4177,113 @@ async def get_user_complete_info(user_id: str, admin_user: User = Depends(get_ad
     if not has_permission(admin_user, "users.view"):
         raise HTTPException(status_code=403, detail="Permission denied")
     
-    # Get user with all fields (except password hash)
-    user = await db.users.find_one(
-        {"user_id": user_id},
-        {"password_hash": 0, "password_reset_token": 0}
+    # Profile and every related collection are fetched concurrently
+    (
+        user,
+        tx_facets,
+        beneficiaries,
+        notifications,
+        support_messages,
+        balance_adjustments,
+    ) = await asyncio.gather(
+        # Get user with all fields (except password hash)
+        db.users.find_one(
+            {"user_id": user_id},
+            {"password_hash": 0, "password_reset_token": 0}
+        ),
+        # ========== TRANSACTIONS ==========
+        # Recent history per type plus server-side totals in one aggregate
+        db.transactions.aggregate([
+            {"$match": {"user_id": user_id}},
+            {"$sort": {"created_at": -1}},
+            {"$project": {
+                "_id": 0, "transaction_id": 1, "type": 1, "status": 1,
+                "amount_input": 1, "amount_output": 1, "payment_method": 1,
+                "created_at": 1, "completed_at": 1, "beneficiary_data": 1,
+                "processed_by": 1, "rejection_reason": 1,
+                "has_proof": {"$cond": [{"$ifNull": ["$proof_image", False]}, True, False]}
+            }},
+            {"$facet": {
+                # History rows are shaped here so they can be returned as-is
+                "recharges": [
+                    {"$match": {"type": "recharge"}},
+                    {"$limit": 200},
+                    {"$project": {
+                        "transaction_id": {"$ifNull": ["$transaction_id", None]},
+                        "amount_brl": {"$ifNull": ["$amount_input", None]},
+                        "amount_ris": {"$ifNull": ["$amount_output", None]},
+                        "status": {"$ifNull": ["$status", None]},
+                        "payment_method": {"$ifNull": ["$payment_method", "pix"]},
+                        "created_at": {"$ifNull": ["$created_at", None]},
+                        "completed_at": {"$ifNull": ["$completed_at", None]},
+                        "has_proof": 1
+                    }}
+                ],
+                "withdrawals": [
+                    {"$match": {"type": "withdrawal"}},
+                    {"$limit": 200},
+                    {"$project": {
+                        "transaction_id": {"$ifNull": ["$transaction_id", None]},
+                        "amount_ris": {"$ifNull": ["$amount_input", None]},
+                        "amount_ves": {"$ifNull": ["$amount_output", None]},
+                        "status": {"$ifNull": ["$status", None]},
+                        "beneficiary": {"$ifNull": ["$beneficiary_data", {}]},
+                        "created_at": {"$ifNull": ["$created_at", None]},
+                        "completed_at": {"$ifNull": ["$completed_at", None]},
+                        "processed_by": {"$ifNull": ["$processed_by", None]},
+                        "has_proof": 1,
+                        "rejection_reason": {"$ifNull": ["$rejection_reason", None]}
+                    }}
+                ],
+                "stats": [{"$group": {
+                    "_id": {"type": "$type", "status": "$status"},
+                    "count": {"$sum": 1},
+                    "sum_in": {"$sum": "$amount_input"},
+                    "sum_out": {"$sum": "$amount_output"}
+                }}]
+            }}
+        ]).to_list(1),
+        # ========== BENEFICIARIES ==========
+        db.beneficiaries.find(
+            {"user_id": user_id},
+            {"_id": 0, "beneficiary_id": 1, "full_name": 1, "bank": 1, "bank_code": 1,
+             "account_number": 1, "id_document": 1, "phone_number": 1, "created_at": 1}
+        ).sort("created_at", -1).to_list(100),
+        # ========== NOTIFICATIONS ==========
+        db.notifications.find(
+            {"user_id": user_id},
+            {"_id": 0, "notification_id": 1, "title": 1, "message": 1, "type": 1, "read": 1, "created_at": 1}
+        ).sort("created_at", -1).limit(50).to_list(50),
+        # ========== SUPPORT MESSAGES ==========
+        db.support_messages.find(
+            {"user_id": user_id},
+            {"_id": 0, "message_id": 1, "sender": 1, "text": 1, "created_at": 1}
+        ).sort("created_at", -1).to_list(100),
+        # ========== ADMIN BALANCE ADJUSTMENTS ==========
+        db.admin_logs.find(
+            {"user_id": user_id, "type": "admin_adjustment"},
+            {"_id": 0}
+        ).sort("created_at", -1).to_list(50),
     )
     if not user:
         raise HTTPException(status_code=404, detail="Usuario no encontrado")
     
     user['_id'] = str(user['_id'])
     
-    # ========== TRANSACTIONS ==========
-    # Get ALL transactions for this user
-    all_transactions = await db.transactions.find(
-        {"user_id": user_id},
-        {"_id": 0}
-    ).sort("created_at", -1).to_list(1000)
-    
-    # Separate by type
-    recharges = [tx for tx in all_transactions if tx.get('type') == 'recharge']
-    withdrawals = [tx for tx in all_transactions if tx.get('type') == 'withdrawal']
-    
-    # Calculate stats
-    completed_recharges = [tx for tx in recharges if tx.get('status') == 'completed']
-    completed_withdrawals = [tx for tx in withdrawals if tx.get('status') == 'completed']
-    pending_recharges = [tx for tx in recharges if tx.get('status') == 'pending']
-    pending_withdrawals = [tx for tx in withdrawals if tx.get('status') == 'pending']
+    facets = tx_facets[0] if tx_facets else {}
+    recharges = facets.get("recharges", [])
+    withdrawals = facets.get("withdrawals", [])
     
-    total_recharged = sum(tx.get('amount_output', 0) for tx in completed_recharges)
-    total_withdrawn = sum(tx.get('amount_input', 0) for tx in completed_withdrawals)
-    total_ves_sent = sum(tx.get('amount_output', 0) for tx in completed_withdrawals)
+    # Stats grouped by (type, status) in MongoDB. Derived at read time on
+    # purpose: transactions change status in many handlers (webhooks, admin
+    # panel, WhatsApp), so denormalized counters on the user would drift.
+    tx_stats = {(g["_id"].get("type"), g["_id"].get("status")): g for g in facets.get("stats", [])}
     
-    # ========== BENEFICIARIES ==========
-    beneficiaries = await db.beneficiaries.find(
-        {"user_id": user_id},
-        {"_id": 0}
-    ).sort("created_at", -1).to_list(100)
-    
-    # ========== NOTIFICATIONS ==========
-    notifications = await db.notifications.find(
-        {"user_id": user_id},
-        {"_id": 0}
-    ).sort("created_at", -1).limit(50).to_list(50)
-    
-    # ========== SUPPORT MESSAGES ==========
-    support_messages = await db.support_messages.find(
-        {"user_id": user_id},
-        {"_id": 0}
-    ).sort("created_at", -1).to_list(100)
-    
-    # ========== ADMIN BALANCE ADJUSTMENTS ==========
-    balance_adjustments = await db.admin_logs.find(
-        {"user_id": user_id, "type": "admin_adjustment"},
-        {"_id": 0}
-    ).sort("created_at", -1).to_list(50)
+    def stat(tx_type, tx_status=None, field="count"):
+        return sum(
+            g[field] for (t, st), g in tx_stats.items()
+            if t == tx_type and (tx_status is None or st == tx_status)
+        )
     
     # Build complete response
     return {
@@ -3900,44 +4336,24 @@ async def get_user_complete_info(user_id: str, admin_user: User = Depends(get_ad
         
         # ===== TRANSACTION STATISTICS =====
         "stats": {
-            "total_transactions": len(all_transactions),
-            "total_recharges": len(recharges),
-            "total_withdrawals": len(withdrawals),
-            "completed_recharges": len(completed_recharges),
-            "completed_withdrawals": len(completed_withdrawals),
-            "pending_recharges": len(pending_recharges),
-            "pending_withdrawals": len(pending_withdrawals),
-            "total_recharged_ris": total_recharged,
-            "total_withdrawn_ris": total_withdrawn,
-            "total_ves_sent": total_ves_sent,
+            "total_transactions": sum(g["count"] for g in tx_stats.values()),
+            "total_recharges": stat("recharge"),
+            "total_withdrawals": stat("withdrawal"),
+            "completed_recharges": stat("recharge", "completed"),
+            "completed_withdrawals": stat("withdrawal", "completed"),
+            "pending_recharges": stat("recharge", "pending"),
+            "pending_withdrawals": stat("withdrawal", "pending"),
+            "total_recharged_ris": stat("recharge", "completed", "sum_out"),
+            "total_withdrawn_ris": stat("withdrawal", "completed", "sum_in"),
+            "total_ves_sent": stat("withdrawal", "completed", "sum_out"),
             "total_beneficiaries": len(beneficiaries),
         },
         
         # ===== RECHARGE HISTORY =====
-        "recharges": [{
-            "transaction_id": tx.get("transaction_id"),
-            "amount_brl": tx.get("amount_input"),
-            "amount_ris": tx.get("amount_output"),
-            "status": tx.get("status"),
-            "payment_method": tx.get("payment_method", "pix"),
-            "created_at": tx.get("created_at"),
-            "completed_at": tx.get("completed_at"),
-            "has_proof": bool(tx.get("proof_image")),
-        } for tx in recharges],
+        "recharges": recharges,
         
         # ===== WITHDRAWAL HISTORY =====
-        "withdrawals": [{
-            "transaction_id": tx.get("transaction_id"),
-            "amount_ris": tx.get("amount_input"),
-            "amount_ves": tx.get("amount_output"),
-            "status": tx.get("status"),
-            "beneficiary": tx.get("beneficiary_data", {}),
-            "created_at": tx.get("created_at"),
-            "completed_at": tx.get("completed_at"),
-            "processed_by": tx.get("processed_by"),
-            "has_proof": bool(tx.get("proof_image")),
-            "rejection_reason": tx.get("rejection_reason"),
-        } for tx in withdrawals],
+        "withdrawals": withdrawals,
         
         # ===== BENEFICIARIES =====
         "beneficiaries": [{
@@ -3984,10 +4400,11 @@ async def update_user_balance(user_id: str, amount: float, admin_user: User = De
         {"$inc": {"balance_ris": amount}}
     )
     
-    if result.modified_count == 0:
+    # matched, not modified: a zero adjustment on an existing user is still valid
+    if result.matched_count == 0:
         raise HTTPException(status_code=404, detail="Usuario no encontrado")
     
-    # Log the adjustment
+    # Log the adjustment only once the balance has actually been updated
     adjustment = {
         "type": "admin_adjustment",
         "user_id": user_id,
@@ -3996,6 +4413,8 @@ async def update_user_balance(user_id: str, amount: float, admin_user: User = De
         "created_at": datetime.now(timezone.utc)
     }
     await db.admin_logs.insert_one(adjustment)
+    invalidate_dashboard_cache()
+    forget_cached_sessions(user_id)
     
     return {"message": f"Balance ajustado en {amount} RIS"}
 
@@ -4006,9 +4425,10 @@ async def get_all_transactions(
     skip: int = 0,
     limit: int = 50,
     type: Optional[str] = None,
-    status: Optional[str] = None
+    status: Optional[str] = None,
+    cursor: Optional[str] = None
 ):
-    """Get all transactions with filters"""
+    """Get all transactions with filters (pass next_cursor back as cursor for deep pages)"""
     if not has_permission(admin_user, "transactions.view"):
         raise HTTPException(status_code=403, detail="Permission denied")
     
@@ -4018,21 +4438,31 @@ async def get_all_transactions(
     if status:
         query["status"] = status
     
-    transactions = await db.transactions.find(
-        query,
+    page_query = apply_page_cursor(query, cursor) if cursor else query
+    tx_cursor = db.transactions.find(
+        page_query,
         {"proof_image": 0}  # Exclude large images
-    ).skip(skip).limit(limit).sort("created_at", -1).to_list(limit)
-    
-    total = await db.transactions.count_documents(query)
+    ).sort(PAGE_SORT)
+    if not cursor:
+        # Legacy offset pagination for the first pages
+        tx_cursor = tx_cursor.skip(skip)
+    transactions = await tx_cursor.limit(limit).to_list(limit)
+    next_cursor = encode_page_cursor(transactions[-1]) if len(transactions) == limit else None
+    
+    if query:
+        total = await db.transactions.count_documents(query)
+    else:
+        total = await db.transactions.estimated_document_count()
     
-    # Get user info for each transaction
+    # Get user info for all transactions in one query
+    users_map = await get_users_map(tx.get('user_id') for tx in transactions)
     for tx in transactions:
         tx['_id'] = str(tx['_id'])
-        user = await db.users.find_one({"user_id": tx.get('user_id')}, {"name": 1, "email": 1})
+        user = users_map.get(tx.get('user_id'))
         tx['user_name'] = user.get('name', 'N/A') if user else 'N/A'
         tx['user_email'] = user.get('email', 'N/A') if user else 'N/A'
     
-    return {"transactions": transactions, "total": total}
+    return {"transactions": transactions, "total": total, "next_cursor": next_cursor}
 
 @api_router.get("/admin/transactions/{transaction_id}")
 async def get_transaction_detail(transaction_id: str, admin_user: User = Depends(get_admin_user)):
@@ -4059,7 +4489,7 @@ async def get_support_chats(admin_user: User = Depends(get_admin_user), status:
     if not has_permission(admin_user, "support.view"):
         raise HTTPException(status_code=403, detail="Permission denied")
     
-    # Get unique users with support messages
+    # Get unique users with support messages, joined with their profile
     pipeline = [
         {"$group": {
             "_id": "$user_id",
@@ -4068,29 +4498,42 @@ async def get_support_chats(admin_user: User = Depends(get_admin_user), status:
             "message_count": {"$sum": 1},
             "status": {"$last": "$status"}
         }},
-        {"$sort": {"last_date": -1}}
+        {"$sort": {"last_date": -1}},
+        {"$limit": 100},
+        {"$lookup": {
+            "from": "users",
+            "let": {"uid": "$_id"},
+            "pipeline": [
+                {"$match": {"$expr": {"$eq": ["$user_id", "$$uid"]}}},
+                {"$project": {"_id": 0, "name": 1, "email": 1}}
+            ],
+            "as": "u"
+        }},
+        {"$unwind": {"path": "$u", "preserveNullAndEmptyArrays": True}},
+        {"$project": {
+            "_id": 0,
+            "user_id": "$_id",
+            "user_name": {"$ifNull": ["$u.name", "N/A"]},
+            "user_email": {"$ifNull": ["$u.email", "N/A"]},
+            # Preview truncated to 100 characters
+            "last_message": {"$let": {
+                "vars": {"m": {"$ifNull": ["$last_message", ""]}},
+                "in": {"$cond": [
+                    {"$gt": [{"$strLenCP": "$$m"}, 100]},
+                    {"$concat": [{"$substrCP": ["$$m", 0, 100]}, "..."]},
+                    "$$m"
+                ]}
+            }},
+            "last_date": 1,
+            "message_count": 1,
+            "status": {"$ifNull": ["$status", "open"]}
+        }}
     ]
     
     if status:
         pipeline.insert(0, {"$match": {"status": status}})
     
-    chats = await db.support_messages.aggregate(pipeline).to_list(100)
-    
-    # Get user info for each chat
-    result = []
-    for chat in chats:
-        user = await db.users.find_one({"user_id": chat['_id']}, {"name": 1, "email": 1})
-        result.append({
-            "user_id": chat['_id'],
-            "user_name": user.get('name', 'N/A') if user else 'N/A',
-            "user_email": user.get('email', 'N/A') if user else 'N/A',
-            "last_message": chat['last_message'][:100] + "..." if len(chat.get('last_message', '')) > 100 else chat.get('last_message', ''),
-            "last_date": chat['last_date'],
-            "message_count": chat['message_count'],
-            "status": chat.get('status', 'open')
-        })
-    
-    return result
+    return await db.support_messages.aggregate(pipeline).to_list(100)
 
 @api_router.get("/admin/support/chat/{user_id}")
 async def get_support_chat_detail(user_id: str, admin_user: User = Depends(get_admin_user)):
@@ -4098,35 +4541,46 @@ async def get_support_chat_detail(user_id: str, admin_user: User = Depends(get_a
     if not has_permission(admin_user, "support.view"):
         raise HTTPException(status_code=403, detail="Permission denied")
     
-    # Get user messages
-    user_messages = await db.support_messages.find({"user_id": user_id}).to_list(100)
+    # User messages and admin responses merged and sorted by MongoDB
+    pipeline = [
+        {"$match": {"user_id": user_id}},
+        {"$project": {
+            "text": {"$ifNull": ["$message", ""]},
+            "image": 1,
+            "sender": {"$literal": "user"},
+            "timestamp": "$created_at"
+        }},
+        {"$unionWith": {
+            "coll": "support_responses",
+            "pipeline": [
+                {"$match": {"user_id": user_id}},
+                {"$project": {
+                    "text": {"$ifNull": ["$message", ""]},
+                    "sender": {"$literal": "admin"},
+                    "timestamp": "$created_at"
+                }}
+            ]
+        }},
+        {"$sort": {"timestamp": 1}},
+        {"$limit": 500}
+    ]
     
-    # Get admin responses
-    admin_responses = await db.support_responses.find({"user_id": user_id}).to_list(100)
+    messages, user = await asyncio.gather(
+        db.support_messages.aggregate(pipeline).to_list(500),
+        db.users.find_one({"user_id": user_id}, {"name": 1, "email": 1})
+    )
     
-    # Combine and sort
     conversation = []
-    for msg in user_messages:
-        conversation.append({
+    for msg in messages:
+        item = {
             "id": str(msg['_id']),
-            "text": msg.get('message', ''),
-            "image": msg.get('image'),
-            "sender": "user",
-            "timestamp": msg.get('created_at').isoformat() if msg.get('created_at') else None
-        })
-    
-    for resp in admin_responses:
-        conversation.append({
-            "id": str(resp['_id']),
-            "text": resp.get('message', ''),
-            "sender": "admin",
-            "timestamp": resp.get('created_at').isoformat() if resp.get('created_at') else None
-        })
-    
-    conversation.sort(key=lambda x: x['timestamp'] if x['timestamp'] else '')
-    
-    # Get user info
-    user = await db.users.find_one({"user_id": user_id}, {"name": 1, "email": 1})
+            "text": msg['text'],
+            "sender": msg['sender'],
+            "timestamp": msg['timestamp'].isoformat() if msg.get('timestamp') else None
+        }
+        if msg['sender'] == "user":
+            item["image"] = msg.get('image')
+        conversation.append(item)
     
     return {
         "user_id": user_id,
@@ -4184,6 +4638,7 @@ class CloseSupportRequest(BaseModel):
 @api_router.post("/admin/support/close")
 async def admin_close_support(request: CloseSupportRequest, admin_user: User = Depends(get_admin_user)):
     """Close a support chat from admin panel"""
+    now = datetime.now(timezone.utc)
     if not has_permission(admin_user, "support.close"):
         raise HTTPException(status_code=403, detail="Permission denied")
     
@@ -4192,7 +4647,7 @@ async def admin_close_support(request: CloseSupportRequest, admin_user: User = D
     # Mark as closed
     await db.support_messages.update_many(
         {"user_id": request.user_id},
-        {"$set": {"status": "closed", "closed_at": datetime.now(timezone.utc), "closed_by": admin_user.user_id}}
+        {"$set": {"status": "closed", "closed_at": now, "closed_by": admin_user.user_id}}
     )
     
     # Save closing message
@@ -4202,7 +4657,7 @@ async def admin_close_support(request: CloseSupportRequest, admin_user: User = D
         "sender": "admin",
         "type": "close",
         "admin_id": admin_user.user_id,
-        "created_at": datetime.now(timezone.utc)
+        "created_at": now
     }
     await db.support_responses.insert_one(admin_response)
     
@@ -4225,14 +4680,16 @@ async def get_all_withdrawals(admin_user: User = Depends(get_admin_user)):
         raise HTTPException(status_code=403, detail="Permission denied")
     
     # Get all withdrawal transactions
-    cursor = db.transactions.find({
+    txs = await db.transactions.find({
         "type": "withdrawal"
-    }).sort("created_at", -1).limit(500)
+    }).sort("created_at", -1).limit(500).to_list(500)
+    
+    # Get user info for all of them in one query
+    users_map = await get_users_map((tx.get("user_id") for tx in txs), fields=("full_name", "email"))
     
     withdrawals = []
-    async for tx in cursor:
-        # Get user info
-        user = await db.users.find_one({"user_id": tx.get("user_id")})
+    for tx in txs:
+        user = users_map.get(tx.get("user_id"))
         withdrawals.append({
             "transaction_id": tx.get("transaction_id"),
             "user_id": tx.get("user_id"),
@@ -4259,14 +4716,16 @@ async def get_pending_withdrawals(admin_user: User = Depends(get_admin_user)):
     if not has_permission(admin_user, "withdrawals.view"):
         raise HTTPException(status_code=403, detail="Permission denied")
     
-    cursor = db.transactions.find({
+    txs = await db.transactions.find({
         "type": "withdrawal",
         "status": "pending"
-    }).sort("created_at", 1)  # Oldest first
+    }, {"proof_image": 0}).sort("created_at", 1).to_list(None)  # Oldest first
+    
+    users_map = await get_users_map((tx.get("user_id") for tx in txs), fields=("full_name",))
     
     withdrawals = []
-    async for tx in cursor:
-        user = await db.users.find_one({"user_id": tx.get("user_id")})
+    for tx in txs:
+        user = users_map.get(tx.get("user_id"))
         withdrawals.append({
             "transaction_id": tx.get("transaction_id"),
             "user_id": tx.get("user_id"),
@@ -4291,30 +4750,42 @@ class ProcessWithdrawalAdminRequest(BaseModel):
 @api_router.post("/admin/withdrawals/process")
 async def process_withdrawal_admin(request: ProcessWithdrawalAdminRequest, admin_user: User = Depends(get_admin_user)):
     """Process withdrawal from admin panel"""
+    now = datetime.now(timezone.utc)
     if not has_permission(admin_user, "withdrawals.process"):
         raise HTTPException(status_code=403, detail="Permission denied")
     
-    tx = await db.transactions.find_one({"transaction_id": request.transaction_id, "status": "pending"})
+    if request.action not in ("approve", "reject"):
+        raise HTTPException(status_code=400, detail="Acción inválida")
+    if request.action == "approve" and not request.proof_image:
+        raise HTTPException(status_code=400, detail="Se requiere imagen de comprobante")
+    
+    # Claim the pending withdrawal atomically: of two concurrent requests only
+    # one gets the document back, so the refund below can't run twice
+    if request.action == "approve":
+        update = {
+            "status": "completed",
+            "proof_image": request.proof_image,
+            "completed_at": now,
+            "processed_by": admin_user.user_id,
+            "processed_via": "admin_panel"
+        }
+    else:
+        update = {
+            "status": "rejected",
+            "rejection_reason": request.rejection_reason or "Rechazado por administrador",
+            "rejected_at": now,
+            "rejected_by": admin_user.user_id
+        }
+    tx = await db.transactions.find_one_and_update(
+        {"transaction_id": request.transaction_id, "status": "pending"},
+        {"$set": update},
+        projection={"_id": 0, "user_id": 1, "amount_input": 1, "beneficiary_data": 1}
+    )
     if not tx:
         raise HTTPException(status_code=404, detail="Transacción no encontrada o ya procesada")
+    invalidate_dashboard_cache()
     
     if request.action == "approve":
-        if not request.proof_image:
-            raise HTTPException(status_code=400, detail="Se requiere imagen de comprobante")
-        
-        await db.transactions.update_one(
-            {"transaction_id": request.transaction_id},
-            {"$set": {
-                "status": "completed",
-                "proof_image": request.proof_image,
-                "completed_at": datetime.now(timezone.utc),
-                "processed_by": admin_user.user_id,
-                "processed_via": "admin_panel"
-            }}
-        )
-        
-        # Notify user
-        user = await db.users.find_one({"user_id": tx['user_id']})
         beneficiary = tx.get('beneficiary_data', {})
         await create_notification(
             user_id=tx['user_id'],
@@ -4326,34 +4797,23 @@ async def process_withdrawal_admin(request: ProcessWithdrawalAdminRequest, admin
         
         return {"message": "Retiro aprobado y usuario notificado"}
     
-    elif request.action == "reject":
-        # Return balance to user
-        await db.users.update_one(
+    # Rejected and claimed by this request: return the balance and notify the user together
+    await asyncio.gather(
+        db.users.update_one(
             {"user_id": tx['user_id']},
             {"$inc": {"balance_ris": tx['amount_input']}}
-        )
-        
-        await db.transactions.update_one(
-            {"transaction_id": request.transaction_id},
-            {"$set": {
-                "status": "rejected",
-                "rejection_reason": request.rejection_reason or "Rechazado por administrador",
-                "rejected_at": datetime.now(timezone.utc),
-                "rejected_by": admin_user.user_id
-            }}
-        )
-        
-        await create_notification(
+        ),
+        create_notification(
             user_id=tx['user_id'],
             title="❌ Retiro Rechazado",
             message=f"Tu retiro de {tx['amount_input']:.2f} RIS fue rechazado. {request.rejection_reason or ''}. El monto fue devuelto a tu balance.",
             notification_type="withdrawal_rejected",
             data={"transaction_id": request.transaction_id}
         )
-        
-        return {"message": "Retiro rechazado y balance devuelto"}
+    )
+    forget_cached_sessions(tx['user_id'])
     
-    raise HTTPException(status_code=400, detail="Acción inválida")
+    return {"message": "Retiro rechazado y balance devuelto"}
 
 # =======================
 # HEALTH CHECK
@@ -4370,6 +4830,9 @@ async def health_check():
 @api_router.post("/test-whatsapp")
 async def test_whatsapp():
     """Test endpoint to send a WhatsApp message"""
+    if not whatsapp_service.enabled:
+        return {"status": "error", "message": "Failed to send WhatsApp message"}
+    
     try:
         test_transaction = {
             "transaction_id": "TEST-123",
@@ -4405,21 +4868,50 @@ async def test_whatsapp():
 app.include_router(api_router)
 app.include_router(admin_router)
 
+# Requests slower than this are logged with their path and status
+SLOW_REQUEST_SECONDS = 1.0
+
+class RequestTimingMiddleware:
+    """Pure ASGI middleware that logs slow HTTP requests (no BaseHTTPMiddleware)"""
+    def __init__(self, app):
+        self.app = app
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        start = time.perf_counter()
+        status_code = 500
+        
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+        
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            if elapsed >= SLOW_REQUEST_SECONDS:
+                logger.warning(f"🐢 {scope['method']} {scope['path']} -> {status_code} en {elapsed:.2f}s")
+
+# JSON lists (transactions, users) shrink several times under gzip; tiny bodies are left alone
+app.add_middleware(GZipMiddleware, minimum_size=1024, compresslevel=5)
+
+app.add_middleware(RequestTimingMiddleware)
+
 app.add_middleware(
     CORSMiddleware,
     allow_credentials=True,
     allow_origins=["*"],
     allow_methods=["*"],
     allow_headers=["*"],
+    # Paged lists return their next cursor in this header
+    expose_headers=["X-Next-Cursor"],
 )
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
-logger = logging.getLogger(__name__)
-
 @app.on_event("startup")
 async def startup_db_client():
     """Create database indexes on startup"""
@@ -4432,8 +4924,62 @@ async def startup_db_client():
         logger.info("Database indexes created successfully")
     except Exception as e:
         logger.warning(f"Index creation warning (may already exist): {e}")
+    
+    # Indexes for the hot auth/user queries and the admin panel, built concurrently
+    results = await asyncio.gather(
+        db.user_sessions.create_index("session_token", unique=True),
+        # Expired sessions are deleted by MongoDB
+        db.user_sessions.create_index("expires_at", expireAfterSeconds=0),
+        # Old sessions are cleared per user on every login
+        db.user_sessions.create_index("user_id"),
+        db.pending_verifications.create_index("email"),
+        db.users.create_index("user_id", unique=True),
+        db.transactions.create_index("transaction_id"),
+        db.transactions.create_index([("user_id", 1), ("type", 1), ("created_at", -1), ("_id", -1)]),
+        db.beneficiaries.create_index([("user_id", 1), ("beneficiary_id", 1)]),
+        # User-facing lists page newest first on (created_at, _id)
+        db.beneficiaries.create_index([("user_id", 1), ("created_at", -1), ("_id", -1)]),
+        db.users.create_index([("role", 1), ("verification_status", 1)]),
+        db.transactions.create_index([("type", 1), ("status", 1), ("created_at", -1), ("_id", -1)]),
+        db.transactions.create_index([("status", 1), ("type", 1)]),
+        db.transactions.create_index([("user_id", 1), ("created_at", -1), ("_id", -1)]),
+        db.support_messages.create_index([("user_id", 1), ("created_at", -1)]),
+        db.support_messages.create_index([("status", 1)]),
+        db.notifications.create_index([("user_id", 1), ("created_at", -1)]),
+        db.admin_logs.create_index([("user_id", 1), ("type", 1), ("created_at", -1)]),
+        db.admin_payment_records.create_index([("recorded_at", -1)]),
+        # Admin user search by name prefix
+        db.users.create_index("name"),
+        # Latest open support thread lookup (WhatsApp replies without user tag).
+        # $in in a partial filter needs MongoDB 6.0+; on older servers this one
+        # fails on its own and the lookup falls back to the plain index below
+        db.support_messages.create_index(
+            [("created_at", -1)],
+            name="open_support_created_at",
+            partialFilterExpression={"status": {"$in": OPEN_SUPPORT_STATUSES}}
+        ),
+        db.support_messages.create_index([("created_at", -1)]),
+        # Keyset pagination in the admin user and transaction lists
+        db.users.create_index(PAGE_SORT),
+        db.transactions.create_index(PAGE_SORT),
+        return_exceptions=True
+    )
+    for result in results:
+        if isinstance(result, Exception):
+            logger.warning(f"Index creation warning: {result}")
+
+@app.on_event("startup")
+async def startup_http_client():
+    """Open the shared outbound HTTP connection pool"""
+    global http_client
+    http_client = httpx.AsyncClient(
+        limits=httpx.Limits(max_connections=100, max_keepalive_connections=20, keepalive_expiry=300),
+        timeout=httpx.Timeout(10.0, connect=5.0)
+    )
 
 @app.on_event("shutdown")
 async def shutdown_db_client():
     client.close()
+    if http_client is not None:
+        await http_client.aclose()
 # Last update: 2026-02-22T21:10:38Z - Support chat fix
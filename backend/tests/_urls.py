@@ -0,0 +1,11 @@
+"""
+Backend endpoint URLs shared by conftest.py and the test modules
+"""
+import os
+
+BASE_URL = os.environ.get('REACT_APP_BACKEND_URL', os.environ.get('EXPO_PUBLIC_BACKEND_URL', '')).rstrip('/')
+
+PENDING_URL = f"{BASE_URL}/api/pix/pending"
+CANCEL_URL = f"{BASE_URL}/api/pix/cancel"
+LOGIN_URL = f"{BASE_URL}/api/auth/login-password"
+RATE_URL = f"{BASE_URL}/api/rate"
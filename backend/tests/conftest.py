@@ -0,0 +1,133 @@
+"""
+Shared fixtures for the backend HTTP tests
+One requests session and one login per test run instead of one per test
+"""
+import pytest
+import requests
+import hashlib
+import json
+import os
+import tempfile
+import time
+from pathlib import Path
+from filelock import FileLock
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from _urls import BASE_URL, PENDING_URL, LOGIN_URL
+
+# Test credentials from the review request
+TEST_USER_EMAIL = "test@ris.app"
+TEST_USER_PASSWORD = "Test1234!"
+SUPER_ADMIN_EMAIL = "marshalljulio46@gmail.com"
+SUPER_ADMIN_PASSWORD = "Admin2025!"
+
+# Explicit identity for the authenticated tests; when set there is no super admin fallback
+PIX_TEST_USER = os.environ.get('PIX_TEST_USER')
+PIX_TEST_PASS = os.environ.get('PIX_TEST_PASS')
+LOGIN_EMAIL, LOGIN_PASSWORD = (
+    (PIX_TEST_USER, PIX_TEST_PASS) if PIX_TEST_USER and PIX_TEST_PASS
+    else (TEST_USER_EMAIL, TEST_USER_PASSWORD)
+)
+
+# Login token of LOGIN_EMAIL reused across pytest invocations against the same
+# backend. A super admin fallback token is never cached: test_login_with_credentials
+# logs the super admin in again, which revokes its other sessions
+TOKEN_CACHE_PATH = Path(tempfile.gettempdir()) / f"ris_token_{hashlib.sha1((BASE_URL + LOGIN_EMAIL).encode()).hexdigest()}.json"
+TOKEN_CACHE_TTL_SECONDS = 30 * 60
+
+
+def load_cached_token(session):
+    """Return the cached token if it is fresh and the backend still accepts it"""
+    try:
+        cached = json.loads(TOKEN_CACHE_PATH.read_text())
+    except (OSError, ValueError):
+        return None
+    if time.time() - cached.get("ts", 0) > TOKEN_CACHE_TTL_SECONDS:
+        return None
+    token = cached.get("token")
+    if not token:
+        return None
+    response = session.get(
+        PENDING_URL,
+        headers={"Authorization": f"Bearer {token}"}
+    )
+    return token if response.status_code == 200 else None
+
+
+def store_cached_token(token):
+    """Persist a freshly issued token for the next run"""
+    try:
+        TOKEN_CACHE_PATH.write_text(json.dumps({"token": token, "ts": time.time()}))
+    except OSError:
+        pass
+
+
+def new_session(headers: dict) -> requests.Session:
+    """Session with a pooled adapter that retries gateway errors on idempotent calls"""
+    session = requests.Session()
+    adapter = HTTPAdapter(
+        pool_connections=4,
+        pool_maxsize=16,
+        max_retries=Retry(total=2, backoff_factor=0.1, status_forcelist=[502, 503, 504])
+    )
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers.update(headers)
+    return session
+
+
+@pytest.fixture(scope="session")
+def unauth_client():
+    """Unauthenticated requests session shared by the whole run"""
+    session = new_session({"Content-Type": "application/json"})
+    yield session
+    session.close()
+
+
+@pytest.fixture(scope="session")
+def auth_identity(unauth_client):
+    """Email and token the run authenticated with (cached on disk, otherwise by logging in once)"""
+    # Under xdist every worker builds its own session fixtures; the lock lets
+    # the first one log in while the rest pick its token up from the cache
+    with FileLock(f"{TOKEN_CACHE_PATH}.lock"):
+        token = load_cached_token(unauth_client)
+        if token:
+            return {"email": LOGIN_EMAIL, "token": token}
+        
+        email = LOGIN_EMAIL
+        response = unauth_client.post(
+            LOGIN_URL,
+            json={"email": LOGIN_EMAIL, "password": LOGIN_PASSWORD}
+        )
+        # The backend answers 401 for both unknown users and bad passwords, so only
+        # that status falls back to super admin, and only for the default test user
+        if response.status_code == 401 and not PIX_TEST_USER:
+            email = SUPER_ADMIN_EMAIL
+            response = unauth_client.post(
+                LOGIN_URL,
+                json={"email": SUPER_ADMIN_EMAIL, "password": SUPER_ADMIN_PASSWORD}
+            )
+        if response.status_code == 200:
+            token = response.json().get("session_token")
+            if email == LOGIN_EMAIL:
+                store_cached_token(token)
+            return {"email": email, "token": token}
+    pytest.skip(f"Could not authenticate: {response.status_code} - {response.text}")
+
+
+@pytest.fixture(scope="session")
+def auth_token(auth_identity):
+    """Session token of auth_identity"""
+    return auth_identity["token"]
+
+
+@pytest.fixture(scope="session")
+def auth_client(auth_token):
+    """Separate session carrying the auth header, so unauth_client stays unauthenticated"""
+    session = new_session({
+        "Content-Type": "application/json",
+        "Authorization": f"Bearer {auth_token}"
+    })
+    yield session
+    session.close()
@@ -0,0 +1,87 @@
+"""
+Unit tests for WhatsAppService
+Tests:
+- Withdrawal notification renders the template (N/A for missing beneficiary fields)
+- Transient Twilio errors are retried, permanent ones are not
+- Unconfigured service skips the send
+The Twilio client is a MagicMock, so these never reach the network
+"""
+import asyncio
+import pytest
+from unittest.mock import MagicMock
+
+pytest.importorskip("twilio")
+pytest.importorskip("dotenv")
+
+import whatsapp_service as whatsapp_module
+from whatsapp_service import WhatsAppService
+from twilio.base.exceptions import TwilioRestException
+
+TWILIO_TEST_ENV = {
+    "TWILIO_ACCOUNT_SID": "AC_test",
+    "TWILIO_AUTH_TOKEN": "token_test",
+    "TWILIO_WHATSAPP_FROM": "whatsapp:+10000000000",
+    "TWILIO_WHATSAPP_TO": "whatsapp:+10000000001",
+}
+
+WITHDRAWAL = {
+    "transaction_id": "TX-1",
+    "amount_input": 100.0,
+    "amount_output": 7800.0,
+    "beneficiary_data": {"full_name": "Ana Pérez", "bank": "Banco Test"},
+}
+USER = {"name": "Test User", "email": "test@example.com"}
+
+
+@pytest.fixture
+def whatsapp(monkeypatch):
+    """Configured WhatsAppService whose Twilio client is a mock"""
+    for key, value in TWILIO_TEST_ENV.items():
+        monkeypatch.setenv(key, value)
+    monkeypatch.setattr(whatsapp_module, "SEND_BACKOFF_BASE_SECONDS", 0)
+    service = WhatsAppService()
+    service.client = MagicMock()
+    service.client.messages.create.return_value = MagicMock(sid="SM_test")
+    return service
+
+
+def test_withdrawal_notification_renders_template(whatsapp):
+    """Withdrawal message carries amounts, user and beneficiary, N/A for missing fields"""
+    assert asyncio.run(whatsapp.send_withdrawal_notification(WITHDRAWAL, USER)) is True
+    
+    kwargs = whatsapp.client.messages.create.call_args.kwargs
+    assert kwargs["to"] == TWILIO_TEST_ENV["TWILIO_WHATSAPP_TO"]
+    assert "💰 Monto: 100.00 RIS → 7800.00 VES" in kwargs["body"]
+    assert "Nombre: Ana Pérez" in kwargs["body"]
+    assert "Cuenta: N/A" in kwargs["body"]
+    assert "🆔 ID: TX-1" in kwargs["body"]
+
+
+def test_transient_twilio_error_is_retried(whatsapp):
+    """A 503 from Twilio is retried and the second attempt succeeds"""
+    whatsapp.client.messages.create.side_effect = [
+        TwilioRestException(503, "https://api.twilio.com", "unavailable"),
+        MagicMock(sid="SM_test"),
+    ]
+    
+    assert asyncio.run(whatsapp.send_withdrawal_notification(WITHDRAWAL, USER)) is True
+    assert whatsapp.client.messages.create.call_count == 2
+
+
+def test_permanent_twilio_error_is_not_retried(whatsapp):
+    """A 400 from Twilio fails the send on the first attempt"""
+    whatsapp.client.messages.create.side_effect = TwilioRestException(400, "https://api.twilio.com", "bad request")
+    
+    assert asyncio.run(whatsapp.send_withdrawal_notification(WITHDRAWAL, USER)) is False
+    assert whatsapp.client.messages.create.call_count == 1
+
+
+def test_unconfigured_service_skips_send(monkeypatch):
+    """Without credentials nothing is sent and no Twilio client is built"""
+    for key in TWILIO_TEST_ENV:
+        monkeypatch.delenv(key, raising=False)
+    service = WhatsAppService()
+    
+    assert service.enabled is False
+    assert asyncio.run(service.send_withdrawal_notification(WITHDRAWAL, USER)) is False
+    assert asyncio.run(service.send_completion_notification("TX-1", "+10000000002")) is False
@@ -1,6 +1,9 @@
 import os
+import asyncio
 import logging
-from twilio.rest import Client
+import random
+from collections import defaultdict
+from functools import cached_property
 from typing import Optional
 from dotenv import load_dotenv
 from pathlib import Path
@@ -11,6 +14,38 @@ load_dotenv(ROOT_DIR / '.env')
 
 logger = logging.getLogger(__name__)
 
+# Missing beneficiary fields render as N/A through format_map's defaultdict
+_WITHDRAWAL_TEMPLATE = """🔔 *NUEVO RETIRO PENDIENTE*
+
+💰 Monto: {amount_ris:.2f} RIS → {amount_ves:.2f} VES
+👤 Usuario: {name}
+📧 Email: {email}
+
+📋 *BENEFICIARIO:*
+Nombre: {full_name}
+Banco: {bank}
+Cuenta: {account_number}
+Cédula: {id_document}
+Teléfono: {phone_number}
+
+🆔 ID: {transaction_id}
+
+---
+Procesa este retiro en el admin panel"""
+
+_COMPLETION_TEMPLATE = """✅ *TRANSACCIÓN COMPLETADA*
+
+Tu retiro ha sido procesado exitosamente.
+
+🆔 ID: {transaction_id}
+
+Gracias por usar RIS App 🚀"""
+
+# Twilio sends are retried on 429/5xx with full-jitter exponential backoff
+SEND_ATTEMPTS = 3
+SEND_BACKOFF_BASE_SECONDS = 0.2
+SEND_BACKOFF_MAX_SECONDS = 2.0
+
 class WhatsAppService:
     def __init__(self):
         self.account_sid = os.getenv('TWILIO_ACCOUNT_SID')
@@ -18,45 +53,54 @@ class WhatsAppService:
         self.from_number = os.getenv('TWILIO_WHATSAPP_FROM')
         self.to_number = os.getenv('TWILIO_WHATSAPP_TO')
         
-        if not all([self.account_sid, self.auth_token, self.from_number, self.to_number]):
+        self.enabled = all([self.account_sid, self.auth_token, self.from_number, self.to_number])
+        if not self.enabled:
             logger.warning("Twilio WhatsApp credentials not configured")
-            self.client = None
-        else:
-            self.client = Client(self.account_sid, self.auth_token)
+    
+    @cached_property
+    def client(self):
+        """Twilio client, built on the first send so importing this module stays cheap"""
+        if not self.enabled:
+            return None
+        from twilio.rest import Client
+        return Client(self.account_sid, self.auth_token)
+    
+    async def _create_message(self, **kwargs):
+        """Send one message off the event loop, retrying transient Twilio errors"""
+        from twilio.base.exceptions import TwilioRestException
+        
+        for attempt in range(SEND_ATTEMPTS):
+            try:
+                # The Twilio SDK blocks, keep it off the event loop
+                return await asyncio.to_thread(self.client.messages.create, **kwargs)
+            except TwilioRestException as e:
+                transient = e.status == 429 or e.status >= 500
+                if not transient or attempt == SEND_ATTEMPTS - 1:
+                    raise
+                delay = random.uniform(0, min(SEND_BACKOFF_MAX_SECONDS, SEND_BACKOFF_BASE_SECONDS * 2 ** attempt))
+                logger.warning(f"Twilio send failed with {e.status}, retrying in {delay:.2f}s")
+                await asyncio.sleep(delay)
     
     async def send_withdrawal_notification(self, transaction_data: dict, user_data: dict) -> bool:
         """Send WhatsApp notification for new withdrawal request"""
-        if not self.client:
+        if not self.enabled:
             logger.warning("Twilio client not configured, skipping WhatsApp notification")
             return False
         
         try:
-            beneficiary = transaction_data.get('beneficiary_data', {})
-            amount_ris = transaction_data.get('amount_input', 0)
-            amount_ves = transaction_data.get('amount_output', 0)
-            transaction_id = transaction_data.get('transaction_id', 'N/A')
-            
             # Format message
-            message_body = f"""🔔 *NUEVO RETIRO PENDIENTE*
-
-💰 Monto: {amount_ris:.2f} RIS → {amount_ves:.2f} VES
-👤 Usuario: {user_data.get('name', 'N/A')}
-📧 Email: {user_data.get('email', 'N/A')}
-
-📋 *BENEFICIARIO:*
-Nombre: {beneficiary.get('full_name', 'N/A')}
-Banco: {beneficiary.get('bank', 'N/A')}
-Cuenta: {beneficiary.get('account_number', 'N/A')}
-Cédula: {beneficiary.get('id_document', 'N/A')}
-Teléfono: {beneficiary.get('phone_number', 'N/A')}
-
-🆔 ID: {transaction_id}
-
----
-Procesa este retiro en el admin panel"""
+            context = defaultdict(lambda: 'N/A', transaction_data.get('beneficiary_data', {}))
+            context.update(
+                amount_ris=transaction_data.get('amount_input', 0),
+                amount_ves=transaction_data.get('amount_output', 0),
+                name=user_data.get('name', 'N/A'),
+                email=user_data.get('email', 'N/A'),
+                transaction_id=transaction_data.get('transaction_id', 'N/A')
+            )
+            message_body = _WITHDRAWAL_TEMPLATE.format_map(context)
             
             # Send message
-            message = self.client.messages.create(
+            message = await self._create_message(
                 from_=self.from_number,
                 body=message_body,
                 to=self.to_number
@@ -71,19 +115,13 @@ Procesa este retiro en el admin panel"""
     
     async def send_completion_notification(self, transaction_id: str, user_phone: Optional[str] = None) -> bool:
         """Send completion notification (optional, if user provides phone)"""
-        if not self.client or not user_phone:
+        if not self.enabled or not user_phone:
             return False
         
         try:
-            message_body = f"""✅ *TRANSACCIÓN COMPLETADA*
-
-Tu retiro ha sido procesado exitosamente.
-
-🆔 ID: {transaction_id}
-
-Gracias por usar RIS App 🚀"""
+            message_body = _COMPLETION_TEMPLATE.format(transaction_id=transaction_id)
             
-            message = self.client.messages.create(
+            message = await self._create_message(
                 from_=self.from_number,
                 body=message_body,
                 to=f"whatsapp:{user_phone}"
@@ -5,40 +5,204 @@ Testing the new PIX verification and admin endpoints
 """
 
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import json
+import orjson
 import base64
 import uuid
 from datetime import datetime
 import sys
+import threading
+import logging
+import logging.handlers
+import queue
+from contextlib import contextmanager
+import functools
+import itertools
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Callable, Optional
 
 # Configuration
 BASE_URL = "https://modern-finance-25.preview.emergentagent.com/api"
+HEALTH_URL = BASE_URL + "/health"
+ROOT_URL = BASE_URL + "/"
+PIX_VERIFY_URL = BASE_URL + "/pix/verify-with-proof"
+
+# (connect, read) timeouts: an unreachable host fails in seconds, slow endpoints keep their read budget
+CONNECT_TIMEOUT = 5.0
+REQUEST_TIMEOUT = (CONNECT_TIMEOUT, 30.0)
+PROBE_TIMEOUT = (CONNECT_TIMEOUT, 10.0)
 ADMIN_EMAIL = "marshalljulio46@gmail.com"
 
+# Sample proof image (1x1 pixel PNG) sent to the verify-with-proof endpoint.
+# Kept as raw bytes (decoded and validated once at import); variants can be
+# derived from the bytes and re-encoded without re-parsing the data URL.
+SAMPLE_PROOF_PNG = base64.b64decode(
+    "iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAADUlEQVR42mP8/5+hHgAHggJ/PchI7wAAAABJRU5ErkJggg==",
+    validate=True
+)
+assert SAMPLE_PROOF_PNG.startswith(b"\x89PNG\r\n\x1a\n"), "sample proof must be a PNG"
+SAMPLE_PROOF_IMAGE = "data:image/png;base64," + base64.b64encode(SAMPLE_PROOF_PNG).decode()
+
+# Replay load run (--load): workers share the session pool (pool_maxsize=20)
+LOAD_CONCURRENCY = 20
+LOAD_ID_PLACEHOLDER = "__TRANSACTION_ID__"
+
+# Request bodies are pre-encoded with orjson, so the content type is set explicitly
+JSON_HEADERS = {"Content-Type": "application/json"}
+
+# Log messages for the expected non-200 answers of the endpoint tests
+STATUS_MESSAGES = {
+    401: "✅ Endpoint exists and requires authentication (expected behavior)",
+    403: "✅ Endpoint exists and requires admin privileges (expected behavior)",
+    404: "Endpoint correctly returned 404 for non-existent transaction",
+}
+
+PASS = "✅ PASS"
+FAIL = "❌ FAIL"
+
+@dataclass(slots=True)
+class ResultRecord:
+    """One logged test outcome"""
+    test: str
+    status: str
+    message: str
+    details: Optional[dict] = None
+
+@dataclass(frozen=True, slots=True)
+class EndpointTest:
+    """One authenticated PIX/admin endpoint check"""
+    name: str
+    banner: str
+    method: str
+    path: str
+    accept: frozenset
+    body: Optional[Callable[[str], dict]] = None
+    success_message: Optional[str] = None
+    success_details: Optional[Callable] = None
+    
+    @property
+    def uses_transaction_id(self):
+        return self.body is not None or "{transaction_id}" in self.path
+
+ENDPOINT_TESTS = [
+    EndpointTest(
+        "PIX Verify with Proof", "📝 Testing PIX verification with proof...",
+        "POST", "/pix/verify-with-proof", frozenset({200, 400, 401, 404}),
+        body=lambda tid: {"transaction_id": tid, "proof_image": SAMPLE_PROOF_IMAGE}
+    ),
+    EndpointTest(
+        "Get Transaction Proof", "🖼️ Testing transaction proof retrieval...",
+        "GET", "/transaction/{transaction_id}/proof", frozenset({200, 400, 401, 404})
+    ),
+    EndpointTest(
+        "Admin Payment Records", "📋 Testing admin payment records...",
+        "GET", "/admin/payment-records", frozenset({200, 401, 403}),
+        success_message="Successfully retrieved payment records",
+        success_details=lambda r: {"status_code": r.status_code, "records_count": len(r.json().get('records', []))}
+    ),
+    EndpointTest(
+        "Admin Pending Recharges", "⏳ Testing admin pending recharges...",
+        "GET", "/admin/pending-recharges", frozenset({200, 401, 403}),
+        success_message="Successfully retrieved pending recharges",
+        success_details=lambda r: {"status_code": r.status_code, "recharges_count": len(r.json().get('recharges', []))}
+    ),
+    EndpointTest(
+        "Admin Recharge Approve", "✅ Testing admin recharge approval...",
+        "POST", "/admin/recharge/approve", frozenset({200, 400, 401, 403, 404}),
+        body=lambda tid: {"transaction_id": tid, "approved": True, "rejection_reason": None}
+    ),
+]
+
+def url_parts(path):
+    """Absolute URL split around the {transaction_id} placeholder (suffix None when absent)"""
+    prefix, placeholder, suffix = path.partition("{transaction_id}")
+    return BASE_URL + prefix, suffix if placeholder else None
+
+ENDPOINT_URL_PARTS = {spec.name: url_parts(spec.path) for spec in ENDPOINT_TESTS}
+
+def maybe_json(response):
+    """Parsed JSON body, or {} when the response is not JSON"""
+    content_type = response.headers.get("content-type")
+    return response.json() if content_type and content_type[:16] == "application/json" else {}
+
+def body_snippet(response, limit=200):
+    """First characters of a (streamed) response body without downloading the rest"""
+    # UTF-8 needs at most 4 bytes per character
+    raw = response.raw.read(limit * 4, decode_content=True) or b""
+    return raw.decode("utf-8", "replace")[:limit]
+
+# Tester output goes through this logger; during a run a QueueListener thread does the writes
+logger = logging.getLogger("ris_tester")
+logger.setLevel(logging.INFO)
+logger.propagate = False
+_stream_handler = logging.StreamHandler(sys.stdout)
+_stream_handler.setFormatter(logging.Formatter("%(message)s"))
+logger.addHandler(_stream_handler)
+
+@contextmanager
+def queued_output():
+    """Route tester output through a background listener so worker threads never block on stdout"""
+    log_queue = queue.SimpleQueue()
+    queue_handler = logging.handlers.QueueHandler(log_queue)
+    listener = logging.handlers.QueueListener(log_queue, _stream_handler)
+    logger.removeHandler(_stream_handler)
+    logger.addHandler(queue_handler)
+    listener.start()
+    try:
+        yield
+    finally:
+        # stop() drains whatever is still queued before returning
+        listener.stop()
+        logger.removeHandler(queue_handler)
+        logger.addHandler(_stream_handler)
+
 class RISAPITester:
     def __init__(self):
         self.session = requests.Session()
+        # One keep-alive pool for every call; gateway errors on idempotent calls are retried
+        adapter = HTTPAdapter(
+            pool_connections=4,
+            pool_maxsize=20,
+            max_retries=Retry(total=2, backoff_factor=0.2, status_forcelist=[502, 503, 504])
+        )
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers.update({"User-Agent": "RIS-tester/1.0", "Connection": "keep-alive"})
+        # Created by the first test that needs it (see _ensure_admin_session)
         self.admin_token = None
+        self._admin_session_lock = threading.Lock()
         self.user_token = None
         self.test_results = []
+        # The PIX endpoint tests run concurrently and all report through log_result
+        self._results_lock = threading.Lock()
+        # Transaction ids are drawn up front so the concurrent tests skip uuid4() per request
+        self._transaction_ids = iter(())
         
     def log_result(self, test_name, success, message, details=None):
         """Log test result"""
-        status = "✅ PASS" if success else "❌ FAIL"
-        result = {
-            "test": test_name,
-            "status": status,
-            "message": message,
-            "details": details or {}
-        }
-        self.test_results.append(result)
-        print(f"{status} {test_name}: {message}")
+        status = PASS if success else FAIL
+        result = ResultRecord(test_name, status, message, details)
+        with self._results_lock:
+            self.test_results.append(result)
+        logger.info("%s %s: %s", status, test_name, message)
         if details and not success:
-            print(f"   Details: {details}")
+            logger.info("   Details: %s", details)
+    
+    def _ensure_admin_session(self):
+        """Create the admin session on first use; later callers reuse it"""
+        with self._admin_session_lock:
+            if self.admin_token is None:
+                self.create_admin_session()
+        return self.admin_token is not None
     
     def create_admin_session(self):
         """Create admin session using the auth endpoint"""
-        print("\n🔐 Creating admin session...")
+        logger.info("\n🔐 Creating admin session...")
         
         # Note: The real auth flow requires Emergent Google Auth with X-Session-ID
         # For testing purposes, we'll try to create a session directly in the database
@@ -51,6 +215,8 @@ class RISAPITester:
             
             # Generate a test session token
             self.admin_token = f"test_admin_token_{uuid.uuid4().hex}"
+            # Every later request is authenticated, so send the token from the session
+            self.session.headers.update({"Authorization": f"Bearer {self.admin_token}"})
             
             # Try to test if we can at least reach the endpoints
             # Even if auth fails, we can verify the endpoints exist and respond correctly
@@ -67,309 +233,75 @@ class RISAPITester:
             self.log_result("Admin Session Creation", False, f"Failed: {str(e)}")
             return False
     
-    def test_pix_verify_with_proof(self):
-        """Test POST /api/pix/verify-with-proof endpoint"""
-        print("\n📝 Testing PIX verification with proof...")
-        
-        # Create a sample base64 image (1x1 pixel PNG)
-        sample_image = "data:image/png;base64,iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAADUlEQVR42mP8/5+hHgAHggJ/PchI7wAAAABJRU5ErkJggg=="
-        
-        # Test data
-        test_data = {
-            "transaction_id": str(uuid.uuid4()),
-            "proof_image": sample_image
-        }
-        
-        headers = {
-            "Authorization": f"Bearer {self.admin_token}",
-            "Content-Type": "application/json"
-        }
-        
-        try:
-            response = self.session.post(
-                f"{BASE_URL}/pix/verify-with-proof",
-                json=test_data,
-                headers=headers,
-                timeout=30
-            )
-            
-            # Check if endpoint exists and responds correctly
-            if response.status_code == 401:
-                self.log_result(
-                    "PIX Verify with Proof", 
-                    True, 
-                    "✅ Endpoint exists and requires authentication (expected behavior)",
-                    {"status_code": response.status_code, "endpoint_functional": True}
-                )
-                return True
-            elif response.status_code == 404:
-                self.log_result(
-                    "PIX Verify with Proof", 
-                    True, 
-                    "Endpoint correctly returned 404 for non-existent transaction",
-                    {"status_code": response.status_code, "response": response.text[:200]}
-                )
-                return True
-            elif response.status_code in [200, 400]:
-                response_data = response.json() if response.headers.get('content-type', '').startswith('application/json') else {}
-                self.log_result(
-                    "PIX Verify with Proof", 
-                    True, 
-                    f"Endpoint working - status {response.status_code}",
-                    {"status_code": response.status_code, "response": response_data}
-                )
-                return True
-            else:
-                self.log_result(
-                    "PIX Verify with Proof", 
-                    False, 
-                    f"Unexpected status code: {response.status_code}",
-                    {"status_code": response.status_code, "response": response.text[:200]}
-                )
-                return False
-                
-        except Exception as e:
-            self.log_result("PIX Verify with Proof", False, f"Request failed: {str(e)}")
-            return False
+    def _next_transaction_id(self):
+        """Next pre-generated transaction id (a fresh one if the pool is used up)"""
+        return next(self._transaction_ids, None) or str(uuid.uuid4())
     
-    def test_get_transaction_proof(self):
-        """Test GET /api/transaction/{transaction_id}/proof endpoint"""
-        print("\n🖼️ Testing transaction proof retrieval...")
-        
-        # Test with a random transaction ID
-        test_transaction_id = str(uuid.uuid4())
-        
-        headers = {
-            "Authorization": f"Bearer {self.admin_token}"
-        }
-        
+    def _classify(self, test_name, response, accept, success_message=None, success_details=None):
+        """Log and return the outcome of an endpoint test from its status code"""
         try:
-            response = self.session.get(
-                f"{BASE_URL}/transaction/{test_transaction_id}/proof",
-                headers=headers,
-                timeout=30
-            )
-            
-            if response.status_code == 401:
-                self.log_result(
-                    "Get Transaction Proof", 
-                    True, 
-                    "✅ Endpoint exists and requires authentication (expected behavior)",
-                    {"status_code": response.status_code, "endpoint_functional": True}
-                )
-                return True
-            elif response.status_code == 404:
-                self.log_result(
-                    "Get Transaction Proof", 
-                    True, 
-                    "Endpoint correctly returned 404 for non-existent transaction",
-                    {"status_code": response.status_code}
-                )
-                return True
-            elif response.status_code in [200, 400]:
-                response_data = response.json() if response.headers.get('content-type', '').startswith('application/json') else {}
-                self.log_result(
-                    "Get Transaction Proof", 
-                    True, 
-                    f"Endpoint working - status {response.status_code}",
-                    {"status_code": response.status_code, "response": response_data}
-                )
-                return True
-            else:
+            code = response.status_code
+            if code not in accept:
                 self.log_result(
-                    "Get Transaction Proof", 
+                    test_name, 
                     False, 
-                    f"Unexpected status code: {response.status_code}",
-                    {"status_code": response.status_code, "response": response.text[:200]}
+                    f"Unexpected status code: {code}",
+                    {"status_code": code, "response": body_snippet(response)}
                 )
                 return False
-                
-        except Exception as e:
-            self.log_result("Get Transaction Proof", False, f"Request failed: {str(e)}")
-            return False
-    
-    def test_admin_payment_records(self):
-        """Test GET /api/admin/payment-records endpoint"""
-        print("\n📋 Testing admin payment records...")
-        
-        headers = {
-            "Authorization": f"Bearer {self.admin_token}"
-        }
-        
-        try:
-            response = self.session.get(
-                f"{BASE_URL}/admin/payment-records",
-                headers=headers,
-                timeout=30
-            )
             
-            if response.status_code == 401:
-                self.log_result(
-                    "Admin Payment Records", 
-                    True, 
-                    "✅ Endpoint exists and requires authentication (expected behavior)",
-                    {"status_code": response.status_code, "endpoint_functional": True}
-                )
-                return True
-            elif response.status_code == 200:
-                response_data = response.json()
-                self.log_result(
-                    "Admin Payment Records", 
-                    True, 
-                    f"Successfully retrieved payment records",
-                    {"status_code": response.status_code, "records_count": len(response_data.get('records', []))}
-                )
-                return True
-            elif response.status_code == 403:
-                self.log_result(
-                    "Admin Payment Records", 
-                    True, 
-                    "✅ Endpoint exists and requires admin privileges (expected behavior)",
-                    {"status_code": response.status_code, "endpoint_functional": True}
-                )
-                return True
+            if code in (401, 403):
+                details = {"status_code": code, "endpoint_functional": True}
+            elif code == 404:
+                details = {"status_code": code}
+            elif success_details:
+                details = success_details(response)
             else:
-                self.log_result(
-                    "Admin Payment Records", 
-                    False, 
-                    f"Unexpected status code: {response.status_code}",
-                    {"status_code": response.status_code, "response": response.text[:200]}
-                )
-                return False
-                
-        except Exception as e:
-            self.log_result("Admin Payment Records", False, f"Request failed: {str(e)}")
-            return False
-    
-    def test_admin_pending_recharges(self):
-        """Test GET /api/admin/pending-recharges endpoint"""
-        print("\n⏳ Testing admin pending recharges...")
-        
-        headers = {
-            "Authorization": f"Bearer {self.admin_token}"
-        }
-        
-        try:
-            response = self.session.get(
-                f"{BASE_URL}/admin/pending-recharges",
-                headers=headers,
-                timeout=30
-            )
+                details = {"status_code": code, "response": maybe_json(response)}
             
-            if response.status_code == 401:
-                self.log_result(
-                    "Admin Pending Recharges", 
-                    True, 
-                    "✅ Endpoint exists and requires authentication (expected behavior)",
-                    {"status_code": response.status_code, "endpoint_functional": True}
-                )
-                return True
-            elif response.status_code == 200:
-                response_data = response.json()
-                self.log_result(
-                    "Admin Pending Recharges", 
-                    True, 
-                    f"Successfully retrieved pending recharges",
-                    {"status_code": response.status_code, "recharges_count": len(response_data.get('recharges', []))}
-                )
-                return True
-            elif response.status_code == 403:
-                self.log_result(
-                    "Admin Pending Recharges", 
-                    True, 
-                    "✅ Endpoint exists and requires admin privileges (expected behavior)",
-                    {"status_code": response.status_code, "endpoint_functional": True}
-                )
-                return True
-            else:
-                self.log_result(
-                    "Admin Pending Recharges", 
-                    False, 
-                    f"Unexpected status code: {response.status_code}",
-                    {"status_code": response.status_code, "response": response.text[:200]}
-                )
-                return False
-                
-        except Exception as e:
-            self.log_result("Admin Pending Recharges", False, f"Request failed: {str(e)}")
-            return False
+            message = STATUS_MESSAGES.get(code) or success_message or f"Endpoint working - status {code}"
+            self.log_result(test_name, True, message, details)
+            return True
+        finally:
+            # Responses are streamed; hand the connection back even if the body was not read
+            response.close()
     
-    def test_admin_recharge_approve(self):
-        """Test POST /api/admin/recharge/approve endpoint"""
-        print("\n✅ Testing admin recharge approval...")
+    def _send(self, spec, transaction_id, body):
+        """Issue the (streamed) request for one ENDPOINT_TESTS entry"""
+        prefix, suffix = ENDPOINT_URL_PARTS[spec.name]
+        url = prefix if suffix is None else prefix + transaction_id + suffix
+        if body is None:
+            return self.session.request(spec.method, url, timeout=REQUEST_TIMEOUT, stream=True)
+        return self.session.request(spec.method, url, data=body, headers=JSON_HEADERS, timeout=REQUEST_TIMEOUT, stream=True)
+    
+    def _run_endpoint_test(self, spec):
+        """Request one ENDPOINT_TESTS entry and classify the response"""
+        logger.info(f"\n{spec.banner}")
         
-        # Test data for approval
-        test_data = {
-            "transaction_id": str(uuid.uuid4()),
-            "approved": True,
-            "rejection_reason": None
-        }
+        if not self._ensure_admin_session():
+            self.log_result(spec.name, False, "No admin session available")
+            return False
         
-        headers = {
-            "Authorization": f"Bearer {self.admin_token}",
-            "Content-Type": "application/json"
-        }
+        transaction_id = self._next_transaction_id() if spec.uses_transaction_id else None
+        body = orjson.dumps(spec.body(transaction_id)) if spec.body else None
         
         try:
-            response = self.session.post(
-                f"{BASE_URL}/admin/recharge/approve",
-                json=test_data,
-                headers=headers,
-                timeout=30
+            response = self._send(spec, transaction_id, body)
+            return self._classify(
+                spec.name, response, spec.accept,
+                success_message=spec.success_message,
+                success_details=spec.success_details
             )
-            
-            if response.status_code == 401:
-                self.log_result(
-                    "Admin Recharge Approve", 
-                    True, 
-                    "✅ Endpoint exists and requires authentication (expected behavior)",
-                    {"status_code": response.status_code, "endpoint_functional": True}
-                )
-                return True
-            elif response.status_code == 404:
-                self.log_result(
-                    "Admin Recharge Approve", 
-                    True, 
-                    "Endpoint correctly returned 404 for non-existent transaction",
-                    {"status_code": response.status_code}
-                )
-                return True
-            elif response.status_code == 403:
-                self.log_result(
-                    "Admin Recharge Approve", 
-                    True, 
-                    "✅ Endpoint exists and requires admin privileges (expected behavior)",
-                    {"status_code": response.status_code, "endpoint_functional": True}
-                )
-                return True
-            elif response.status_code in [200, 400]:
-                response_data = response.json() if response.headers.get('content-type', '').startswith('application/json') else {}
-                self.log_result(
-                    "Admin Recharge Approve", 
-                    True, 
-                    f"Endpoint working - status {response.status_code}",
-                    {"status_code": response.status_code, "response": response_data}
-                )
-                return True
-            else:
-                self.log_result(
-                    "Admin Recharge Approve", 
-                    False, 
-                    f"Unexpected status code: {response.status_code}",
-                    {"status_code": response.status_code, "response": response.text[:200]}
-                )
-                return False
-                
         except Exception as e:
-            self.log_result("Admin Recharge Approve", False, f"Request failed: {str(e)}")
+            self.log_result(spec.name, False, f"Request failed: {str(e)}")
             return False
     
     def test_health_check(self):
         """Test basic health check endpoint"""
-        print("\n🏥 Testing health check...")
+        logger.info("\n🏥 Testing health check...")
         
         try:
-            response = self.session.get(f"{BASE_URL}/health", timeout=10)
+            response = self.session.get(HEALTH_URL, timeout=PROBE_TIMEOUT)
             
             if response.status_code == 200:
                 self.log_result("Health Check", True, "API is responding")
@@ -384,11 +316,11 @@ class RISAPITester:
     
     def test_api_structure(self):
         """Test basic API structure and routing"""
-        print("\n🏗️ Testing API structure...")
+        logger.info("\n🏗️ Testing API structure...")
         
         try:
             # Test root API endpoint
-            response = self.session.get(f"{BASE_URL}/", timeout=10)
+            response = self.session.get(ROOT_URL, timeout=PROBE_TIMEOUT)
             
             if response.status_code == 200:
                 response_data = response.json()
@@ -423,11 +355,11 @@ class RISAPITester:
     
     def test_endpoint_methods(self):
         """Test that endpoints respond correctly to wrong HTTP methods"""
-        print("\n🔧 Testing endpoint HTTP methods...")
+        logger.info("\n🔧 Testing endpoint HTTP methods...")
         
         try:
             # Test POST endpoint with GET (should return 405 Method Not Allowed)
-            response = self.session.get(f"{BASE_URL}/pix/verify-with-proof", timeout=10)
+            response = self.session.get(PIX_VERIFY_URL, timeout=PROBE_TIMEOUT)
             
             if response.status_code == 405:
                 self.log_result(
@@ -461,65 +393,118 @@ class RISAPITester:
     
     def run_all_tests(self):
         """Run all tests"""
-        print("🚀 Starting RIS PIX Endpoints Testing")
-        print(f"📡 Base URL: {BASE_URL}")
-        print(f"👤 Admin Email: {ADMIN_EMAIL}")
-        print("=" * 60)
+        try:
+            with queued_output():
+                return self._run_all_tests()
+        finally:
+            self.session.close()
+    
+    def _run_all_tests(self):
+        """Run all tests on the open session"""
+        logger.info("🚀 Starting RIS PIX Endpoints Testing")
+        logger.info(f"📡 Base URL: {BASE_URL}")
+        logger.info(f"👤 Admin Email: {ADMIN_EMAIL}")
+        logger.info("=" * 60)
         
         # Test basic connectivity first
         if not self.test_health_check():
-            print("\n❌ API is not reachable. Stopping tests.")
+            logger.info("\n❌ API is not reachable. Stopping tests.")
             return False
         
         # Test API structure
         if not self.test_api_structure():
-            print("\n⚠️ API structure test failed, but continuing with endpoint tests.")
+            logger.info("\n⚠️ API structure test failed, but continuing with endpoint tests.")
         
         # Test endpoint methods
         if not self.test_endpoint_methods():
-            print("\n⚠️ Endpoint methods test failed, but continuing with main tests.")
-        
-        # Create admin session
-        if not self.create_admin_session():
-            print("\n❌ Could not create admin session. Stopping tests.")
-            return False
+            logger.info("\n⚠️ Endpoint methods test failed, but continuing with main tests.")
         
-        # Run PIX endpoint tests
-        tests = [
-            self.test_pix_verify_with_proof,
-            self.test_get_transaction_proof,
-            self.test_admin_payment_records,
-            self.test_admin_pending_recharges,
-            self.test_admin_recharge_approve
-        ]
+        # Run PIX endpoint tests (independent requests, so overlap their round trips)
+        tests = [functools.partial(self._run_endpoint_test, spec) for spec in ENDPOINT_TESTS]
         
-        passed = 0
         total = len(tests)
-        
-        for test in tests:
-            if test():
-                passed += 1
+        self._transaction_ids = iter([str(uuid.uuid4()) for _ in range(total)])
+        with ThreadPoolExecutor(max_workers=total) as executor:
+            outcomes = list(executor.map(lambda test: test(), tests))
+        passed = sum(outcomes)
         
         # Print summary
-        print("\n" + "=" * 60)
-        print("📊 TEST SUMMARY")
-        print("=" * 60)
+        logger.info("\n" + "=" * 60)
+        logger.info("📊 TEST SUMMARY")
+        logger.info("=" * 60)
         
-        for result in self.test_results:
-            print(f"{result['status']} {result['test']}: {result['message']}")
+        logger.info("\n".join(f"{r.status} {r.test}: {r.message}" for r in self.test_results))
         
-        print(f"\n🎯 Results: {passed}/{total} tests passed")
+        logger.info(f"\n🎯 Results: {passed}/{total} tests passed")
         
         if passed == total:
-            print("🎉 All tests passed!")
+            logger.info("🎉 All tests passed!")
             return True
         else:
-            print(f"⚠️  {total - passed} tests failed")
+            logger.info(f"⚠️  {total - passed} tests failed")
             return False
 
+    def run_load(self, total_requests, concurrency=None):
+        """Replay the endpoint tests total_requests times and report status counts and latency"""
+        with queued_output():
+            return self._run_load(total_requests, concurrency or LOAD_CONCURRENCY)
+    
+    def _run_load(self, total_requests, concurrency):
+        """Replay load run with output routed through the log listener"""
+        logger.info(f"🔥 Replaying {total_requests} requests against {BASE_URL} ({concurrency} concurrent)")
+        self._ensure_admin_session()
+        
+        # Serialize each body once with a placeholder id; replays only splice in a fresh id
+        skeletons = {
+            spec.name: orjson.dumps(spec.body(LOAD_ID_PLACEHOLDER)) if spec.body else None
+            for spec in ENDPOINT_TESTS
+        }
+        
+        def replay(spec):
+            transaction_id = str(uuid.uuid4()) if spec.uses_transaction_id else None
+            skeleton = skeletons[spec.name]
+            body = skeleton.replace(LOAD_ID_PLACEHOLDER.encode(), transaction_id.encode()) if skeleton else None
+            start = time.perf_counter()
+            try:
+                response = self._send(spec, transaction_id, body)
+                response.close()
+                outcome = response.status_code
+            except Exception as e:
+                outcome = type(e).__name__
+            return spec.name, outcome, time.perf_counter() - start
+        
+        specs = itertools.islice(itertools.cycle(ENDPOINT_TESTS), total_requests)
+        started = time.perf_counter()
+        try:
+            with ThreadPoolExecutor(max_workers=concurrency) as executor:
+                results = list(executor.map(replay, specs))
+        finally:
+            self.session.close()
+        elapsed = time.perf_counter() - started
+        if not results:
+            return results
+        
+        latencies = sorted(latency for _, _, latency in results)
+        def percentile(p):
+            return latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000
+        
+        logger.info("\n" + "=" * 60)
+        logger.info("📊 LOAD SUMMARY")
+        logger.info("=" * 60)
+        for (name, outcome), count in sorted(Counter((n, o) for n, o, _ in results).items(), key=str):
+            logger.info(f"{name} → {outcome}: {count}")
+        logger.info(f"\n⏱️  p50 {percentile(0.50):.0f} ms · p95 {percentile(0.95):.0f} ms · p99 {percentile(0.99):.0f} ms")
+        logger.info(f"🚀 {len(results) / elapsed:.1f} req/s over {elapsed:.1f} s")
+        return results
+
 def main():
-    """Main function"""
+    """Main function (pass --load N [CONCURRENCY] for a replay load run)"""
     tester = RISAPITester()
+    if len(sys.argv) > 2 and sys.argv[1] == "--load":
+        concurrency = int(sys.argv[3]) if len(sys.argv) > 3 else LOAD_CONCURRENCY
+        tester.run_load(int(sys.argv[2]), concurrency)
+        sys.exit(0)
+    
     success = tester.run_all_tests()
     
     if success: